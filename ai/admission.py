@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class AdmissionConfig:
+    # сколько тяжёлых запросов (encode + скоринг) выполняется одновременно
+    max_concurrency: int = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+    # сколько запросов может ждать слот; остальные сразу получают 503
+    max_queue: int = int(os.getenv("AI_MAX_QUEUE", "32"))
+    # дедлайн по умолчанию, если клиент не прислал свой в DEADLINE_HEADER
+    default_deadline_ms: float = float(os.getenv("AI_REQUEST_DEADLINE_MS", "30000"))
+    retry_after_s: int = int(os.getenv("AI_RETRY_AFTER_S", "1"))
+
+
+# бюджет клиента на запрос в миллисекундах (с учётом его собственного таймаута)
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+
+class Overloaded(Exception):
+    """Очередь ожидания заполнена — запрос отклонён без выполнения."""
+
+    def __init__(self, retry_after_s: int) -> None:
+        super().__init__("Service is overloaded")
+        self.retry_after_s = retry_after_s
+
+
+class DeadlineExceeded(Exception):
+    """Дедлайн истёк (или клиент отключился) до начала вычислений."""
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    rejected: int = 0
+    expired: int = 0
+    queue_wait_ms_total: float = 0.0
+    queue_wait_ms_max: float = 0.0
+    compute_ms_total: float = 0.0
+    compute_ms_max: float = 0.0
+
+
+@dataclass
+class Timing:
+    queue_wait_ms: float
+    compute_ms: float
+
+
+class AdmissionController:
+    """Ограничивает число одновременных CPU-тяжёлых запросов.
+
+    Запрос ждёт слот в ограниченной очереди; если она полна, сразу отбрасывается
+    (Overloaded -> 503 + Retry-After), чтобы при всплеске не тормозили все запросы
+    разом. Пока запрос ждал, дедлайн мог истечь или клиент мог уйти — такая работа
+    не запускается (DeadlineExceeded). Время ожидания и вычисления считаются отдельно.
+    """
+
+    def __init__(self, config: Optional[AdmissionConfig] = None) -> None:
+        self.config = config or AdmissionConfig()
+        self.stats = AdmissionStats()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+
+    def _sem(self) -> asyncio.Semaphore:
+        # создаётся лениво внутри event loop'а uvicorn
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(self.config.max_concurrency, 1))
+        return self._semaphore
+
+    def deadline_from(self, header_value: Optional[str]) -> float:
+        """Абсолютный дедлайн (time.monotonic) по заголовку клиента или дефолту."""
+        budget_ms = self.config.default_deadline_ms
+        if header_value:
+            try:
+                budget_ms = min(float(header_value), budget_ms)
+            except ValueError:
+                pass
+        return time.monotonic() + budget_ms / 1000.0
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        deadline: float,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        **kwargs: Any,
+    ) -> "tuple[Any, Timing]":
+        sem = self._sem()
+        # все счётчики меняются только в event loop, поэтому проверка без гонок
+        if self._waiting + self._in_flight >= max(self.config.max_concurrency, 1) + self.config.max_queue:
+            self.stats.rejected += 1
+            raise Overloaded(self.config.retry_after_s)
+
+        queued_at = time.monotonic()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=max(deadline - queued_at, 0.0))
+        except asyncio.TimeoutError:
+            self.stats.expired += 1
+            raise DeadlineExceeded("Deadline exceeded while waiting in queue") from None
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            started_at = time.monotonic()
+            queue_wait_ms = (started_at - queued_at) * 1000.0
+            if started_at >= deadline or (is_disconnected is not None and await is_disconnected()):
+                self.stats.expired += 1
+                raise DeadlineExceeded("Caller gave up before the request was admitted")
+
+            result = await run_in_threadpool(fn, *args, **kwargs)
+            compute_ms = (time.monotonic() - started_at) * 1000.0
+        finally:
+            self._in_flight -= 1
+            sem.release()
+
+        s = self.stats
+        s.admitted += 1
+        s.queue_wait_ms_total += queue_wait_ms
+        s.queue_wait_ms_max = max(s.queue_wait_ms_max, queue_wait_ms)
+        s.compute_ms_total += compute_ms
+        s.compute_ms_max = max(s.compute_ms_max, compute_ms)
+        return result, Timing(queue_wait_ms=queue_wait_ms, compute_ms=compute_ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        s = self.stats
+        return {
+            "max_concurrency": self.config.max_concurrency,
+            "max_queue": self.config.max_queue,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "admitted": s.admitted,
+            "rejected": s.rejected,
+            "expired": s.expired,
+            "queue_wait_ms_avg": s.queue_wait_ms_total / s.admitted if s.admitted else 0.0,
+            "queue_wait_ms_max": s.queue_wait_ms_max,
+            "compute_ms_avg": s.compute_ms_total / s.admitted if s.admitted else 0.0,
+            "compute_ms_max": s.compute_ms_max,
+        }
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.logging import get_logger
+
+from .store import ArticleVectorStore
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class AnnIndexConfig:
+    # пока статей меньше min_train_size — обычный точный перебор, он и так быстрый
+    min_train_size: int = int(os.getenv("ANN_MIN_TRAIN_SIZE", "4096"))
+    # 0 -> nlist подбирается как ~4*sqrt(N)
+    nlist: int = int(os.getenv("ANN_NLIST", "0"))
+    nprobe: int = int(os.getenv("ANN_NPROBE", "16"))
+    # переобучаем центроиды, когда корпус вырос в retrain_growth раз с прошлого обучения
+    retrain_growth: float = 2.0
+    kmeans_iters: int = 12
+    train_sample: int = 100_000
+    assign_chunk: int = 65_536
+    # потолок промежуточной матрицы скоров строк с центроидами (chunk x nlist float32):
+    # 64M элементов = 256 MB, при nlist=4000 это ~16k строк за раз
+    max_score_elements: int = 64 * 1024 * 1024
+    seed: int = 0
+
+
+class IVFIndex:
+    """IVF-Flat поверх ArticleVectorStore (скалярное произведение = косинус для нормированных векторов).
+
+    Векторы не копируются: в инвертированных списках лежат номера строк матрицы стора.
+    Поиск просматривает только nprobe ближайших кластеров, т.е. ~N * nprobe / nlist строк.
+    """
+
+    def __init__(self, store: ArticleVectorStore, config: Optional[AnnIndexConfig] = None) -> None:
+        self.store = store
+        self.config = config or AnnIndexConfig()
+        self._lock = threading.RLock()
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)   # строка стора -> номер списка
+        self._lists: List[np.ndarray] = []
+        self._trained_size = 0
+        # фоновое переобучение и строки, пришедшие в add, пока оно идёт
+        self._training = False
+        self._pending: List[np.ndarray] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self._centroids is None else int(self._centroids.shape[0])
+
+    # ----------------- training -----------------
+
+    def _pick_nlist(self, n: int) -> int:
+        if self.config.nlist > 0:
+            return min(self.config.nlist, n)
+        return max(1, min(n, int(4 * math.sqrt(n))))
+
+    def _chunk_rows(self, nlist: int) -> int:
+        return max(1, min(self.config.assign_chunk, self.config.max_score_elements // max(nlist, 1)))
+
+    def _nearest(self, data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """argmax по центроидам кусками, чтобы не держать всю (N x nlist) матрицу скоров."""
+        out = np.empty(data.shape[0], dtype=np.int32)
+        step = self._chunk_rows(centroids.shape[0])
+        for start in range(0, data.shape[0], step):
+            out[start : start + step] = np.argmax(data[start : start + step] @ centroids.T, axis=1)
+        return out
+
+    def _kmeans(self, data: np.ndarray, k: int) -> np.ndarray:
+        # сферический k-means: центроиды нормируем, близость — скалярное произведение
+        rng = np.random.default_rng(self.config.seed)
+        centroids = data[rng.choice(data.shape[0], size=k, replace=False)].copy()
+        for _ in range(self.config.kmeans_iters):
+            labels = self._nearest(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            counts = np.bincount(labels, minlength=k)
+            empty = counts == 0
+            if empty.any():
+                # пустой кластер переинициализируем случайной точкой
+                sums[empty] = data[rng.choice(data.shape[0], size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def _assign_rows(self, centroids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        out = np.empty(rows.shape[0], dtype=np.int32)
+        step = self._chunk_rows(centroids.shape[0])
+        for start in range(0, rows.shape[0], step):
+            chunk = self.store.get(rows[start : start + step])
+            out[start : start + step] = np.argmax(chunk @ centroids.T, axis=1)
+        return out
+
+    def _build_lists(self, assign: np.ndarray, nlist: int) -> List[np.ndarray]:
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        return [order[bounds[i] : bounds[i + 1]].astype(np.int64) for i in range(nlist)]
+
+    def _fit(self) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """(центроиды, назначения строк, размер корпуса) — без изменения состояния индекса."""
+        n = len(self.store)
+        if n < self.config.min_train_size:
+            return None
+
+        nlist = self._pick_nlist(n)
+        rng = np.random.default_rng(self.config.seed)
+        sample_rows = np.arange(n)
+        if n > self.config.train_sample:
+            sample_rows = np.sort(rng.choice(n, size=self.config.train_sample, replace=False))
+
+        logger.info("Training IVF index", extra={"size": n, "nlist": nlist})
+        centroids = self._kmeans(self.store.get(sample_rows), nlist)
+        assign = self._assign_rows(centroids, np.arange(n))
+        logger.info("IVF index trained", extra={"size": n, "nlist": nlist})
+        return centroids, assign, n
+
+    def train(self) -> None:
+        """Синхронное обучение (на старте, когда сохранённого индекса нет)."""
+        fitted = self._fit()
+        if fitted is None:
+            return
+        centroids, assign, n = fitted
+        with self._lock:
+            self._centroids = centroids
+            self._assign = assign
+            self._lists = self._build_lists(assign, centroids.shape[0])
+            self._trained_size = n
+
+    def train_async(self) -> bool:
+        """Запускает переобучение в фоновом потоке; False, если оно уже идёт.
+
+        Пока центроиды считаются, поиск и add работают по старому индексу (или точным
+        перебором, если его ещё нет). Строки, добавленные за это время, перед подменой
+        назначаются по новым центроидам.
+        """
+        with self._lock:
+            if self._training:
+                return False
+            self._training = True
+            self._pending = []
+        threading.Thread(target=self._train_worker, name="ivf-train", daemon=True).start()
+        return True
+
+    def _train_worker(self) -> None:
+        try:
+            fitted = self._fit()
+            if fitted is None:
+                return
+            centroids, assign, n = fitted
+            with self._lock:
+                size = len(self.store)
+                if size > assign.shape[0]:
+                    assign = np.concatenate([assign, np.full(size - assign.shape[0], -1, dtype=np.int32)])
+                # новые строки и обновлённые за время обучения векторы старых строк
+                catch_up = np.unique(np.concatenate(self._pending + [np.arange(n, size, dtype=np.int64)]))
+                catch_up = catch_up[catch_up < size]
+                if catch_up.size:
+                    assign[catch_up] = self._assign_rows(centroids, catch_up)
+                self._centroids = centroids
+                self._assign = assign
+                self._lists = self._build_lists(assign, centroids.shape[0])
+                self._trained_size = n
+        except Exception:
+            logger.exception("IVF index retraining failed")
+        finally:
+            with self._lock:
+                self._training = False
+                self._pending = []
+
+    def _needs_training(self, size: int) -> bool:
+        if size < self.config.min_train_size:
+            return False
+        return self._centroids is None or size >= self._trained_size * self.config.retrain_growth
+
+    # ----------------- incremental updates -----------------
+
+    def add(self, rows: Sequence[int]) -> None:
+        """Добавляет (или переназначает обновлённые) строки стора; переобучение — в фоне."""
+        rows_arr = np.unique(np.asarray(rows, dtype=np.int64))
+        with self._lock:
+            if self._training:
+                self._pending.append(rows_arr)
+        if self._needs_training(len(self.store)):
+            self.train_async()
+
+        centroids = self._centroids
+        if centroids is None or not rows_arr.size:
+            return
+        labels = self._assign_rows(centroids, rows_arr)
+
+        with self._lock:
+            if self._centroids is not centroids:
+                # пока считали, фоновое обучение подменило индекс — строки уже в нём
+                return
+            size = len(self.store)
+            if self._assign.shape[0] < size:
+                grown = np.full(size, -1, dtype=np.int32)
+                grown[: self._assign.shape[0]] = self._assign
+                self._assign = grown
+
+            old = self._assign[rows_arr]
+            moved = old != labels
+            # уже известные строки, сменившие кластер, убираем из старого списка
+            for lst in np.unique(old[moved & (old >= 0)]):
+                drop = rows_arr[moved & (old == lst)]
+                self._lists[lst] = self._lists[lst][~np.isin(self._lists[lst], drop)]
+            for lst in np.unique(labels[moved]):
+                add = rows_arr[moved & (labels == lst)]
+                self._lists[lst] = np.concatenate([self._lists[lst], add])
+            self._assign[rows_arr] = labels
+
+    # ----------------- persistence -----------------
+
+    def _paths(self) -> Tuple[str, str]:
+        base = self.store.config.store_dir or "."
+        return os.path.join(base, "ivf_centroids.npy"), os.path.join(base, "ivf_assign.npy")
+
+    def save(self, size: Optional[int] = None) -> None:
+        """size — сколько строк в снимке стора: назначения сверх него не пишем,
+        иначе при загрузке снимок индекса окажется длиннее стора и уйдёт в переобучение."""
+        if not self.store.config.store_dir or self._centroids is None:
+            return
+        with self._lock:
+            centroids = self._centroids.copy()
+            assign = self._assign[:size].copy()
+        for path, arr in zip(self._paths(), (centroids, assign)):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+
+    def load(self) -> None:
+        """Поднимает центроиды с диска; если их нет — обучает заново."""
+        centroids_path, assign_path = self._paths()
+        size = len(self.store)
+        if not (self.store.config.store_dir and os.path.exists(centroids_path) and os.path.exists(assign_path)):
+            self.train()
+            return
+        try:
+            centroids = np.load(centroids_path)
+            assign = np.load(assign_path)
+        except Exception:
+            logger.exception("Failed to load IVF index, retraining")
+            self.train()
+            return
+        if centroids.shape[1] != self.store.dim or assign.shape[0] > size:
+            self.train()
+            return
+
+        if assign.shape[0] < size:
+            # строки, добавленные после последнего сохранения индекса
+            tail = self._assign_rows(centroids, np.arange(assign.shape[0], size))
+            assign = np.concatenate([assign, tail])
+
+        with self._lock:
+            self._centroids = centroids
+            self._assign = assign
+            self._lists = self._build_lists(assign, centroids.shape[0])
+            self._trained_size = size
+        logger.info("IVF index loaded", extra={"size": size, "nlist": int(centroids.shape[0])})
+
+    # ----------------- search -----------------
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        with self._lock:
+            if self._centroids is None:
+                return None
+            nprobe = min(self.config.nprobe, self._centroids.shape[0])
+            centroid_scores = self._centroids @ query
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            return np.concatenate([self._lists[i] for i in probe])
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        exclude_ids: Iterable[int] = (),
+    ) -> Tuple[List[int], np.ndarray]:
+        """Top-k article_id по скалярному произведению с query, без exclude_ids."""
+        size = len(self.store)
+        if size == 0 or k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        rows = self._candidate_rows(query)
+        if rows is None:
+            rows = np.arange(size)
+            scores = self.store.score(query)[:size]
+        else:
+            # строки, дописанные в стор уже после того, как мы взяли размер
+            rows = rows[rows < size]
+            scores = self.store.score(query, rows)
+        ids = self.store.ids[rows]
+
+        exclude = np.fromiter((int(i) for i in exclude_ids), dtype=np.int64)
+        if exclude.size:
+            keep = ~np.isin(ids, exclude)
+            ids, scores = ids[keep], scores[keep]
+        if ids.size == 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return ids[top].tolist(), scores[top]
@@ -1,19 +1,53 @@
 from __future__ import annotations
 
-from typing import List, Optional
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import base64
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ConfigDict
 
 from shared.logging import setup_logging, get_logger
+from ai.admission import AdmissionController, DeadlineExceeded, Overloaded, DEADLINE_HEADER
+from ai.metrics import REGISTRY, REQUEST_COMPUTE_SECONDS, REQUEST_QUEUE_SECONDS, gauges_from_stats
+from ai.profiler import profiler
 from ai.model_core import (
     recommend as core_recommend,
-    self_test as core_self_test,
+    startup as core_startup,
+    readiness as core_readiness,
+    mark_ready as core_mark_ready,
+    stats as core_stats,
+    shutdown as core_shutdown,
+    model_name as core_model_name,
+    embed_articles as core_embed_articles,
+    upsert_article_vectors as core_upsert_article_vectors,
+    recommend_by_ids as core_recommend_by_ids,
+    recommend_batch as core_recommend_batch,
+    UserTexts,
     RecommendationResult,
+    RecommendationByIdsResult,
 )
 
 setup_logging()
 logger = get_logger(__name__)
 
+# 1 -> модель грузится и прогревается на старте, /health/ready ждёт этого
+AI_PRELOAD = os.getenv("AI_PRELOAD", "1") == "1"
+# сэмплирующий профайлер с самого старта; на лету — POST /debug/profiler
+AI_PROFILER = os.getenv("AI_PROFILER", "0") == "1"
+
+admission = AdmissionController()
+
+# текущее состояние кэша, батчера, пула и очереди снимается на каждый scrape /metrics
+REGISTRY.add_collector(lambda: gauges_from_stats("ai", {
+    **core_stats(),
+    "admission": admission.snapshot(),
+    "profiler": profiler.snapshot(),
+}))
+
 app = FastAPI(
     title="Anime News Recommender API",
     version="1.0.0",
@@ -28,6 +62,17 @@ class RecommendRequest(BaseModel):
     top_k: Optional[int] = None
 
 
+class UserTextsDTO(BaseModel):
+    liked_texts: List[str]
+    disliked_texts: List[str] = []
+
+
+class RecommendBatchRequest(BaseModel):
+    users: List[UserTextsDTO]
+    candidate_news: List[str]
+    top_k: Optional[int] = None
+
+
 class RecommendedItemDTO(BaseModel):
     index: int
     score: float
@@ -37,20 +82,198 @@ class RecommendResponse(BaseModel):
     items: List[RecommendedItemDTO]
 
 
+class RecommendBatchResponse(BaseModel):
+    results: List[RecommendResponse]
+
+
+class ArticleTextDTO(BaseModel):
+    id: int
+    text: str
+
+
+class ArticleVectorDTO(BaseModel):
+    id: int
+    vector: str  # base64(float32 little-endian)
+
+
+class EmbedArticlesRequest(BaseModel):
+    items: List[ArticleTextDTO]
+
+
+class EmbedArticlesResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str
+    dim: int
+    items: List[ArticleVectorDTO]
+
+
+class UpsertVectorsRequest(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str
+    items: List[ArticleVectorDTO]
+
+
+class UpsertVectorsResponse(BaseModel):
+    stored: int
+
+
+class RecommendByIdsRequest(BaseModel):
+    liked_ids: List[int] = []
+    disliked_ids: List[int] = []
+    # None -> кандидаты достаются из ANN-индекса по всему корпусу
+    candidate_ids: Optional[List[int]] = None
+    exclude_ids: List[int] = []
+    candidate_limit: int = 200
+    top_k: Optional[int] = None
+    # готовый профиль пользователя, base64(float32); если задан, liked/disliked не используются
+    user_vector: Optional[str] = None
+
+
+class RecommendedArticleDTO(BaseModel):
+    article_id: int
+    score: float
+
+
+class RecommendByIdsResponse(BaseModel):
+    items: List[RecommendedArticleDTO]
+    missing_ids: List[int]
+
+
+class ProfilerRequest(BaseModel):
+    enabled: bool
+    interval_ms: Optional[float] = None
+    reset: bool = False
+
+
 class HealthResponse(BaseModel):
     status: str
 
 
-@app.get("/health", response_model=HealthResponse)
-def health_check() -> HealthResponse:
-    ok = core_self_test()
-    if ok:
-        return HealthResponse(status="ok")
-    raise HTTPException(status_code=500, detail="Model self-test failed")
+class ReadinessResponse(BaseModel):
+    status: str
+    error: Optional[str] = None
+    stages_ms: Dict[str, float] = {}
+
+
+class StatsResponse(BaseModel):
+    embedding_cache: Dict[str, float]
+    encode_batcher: Dict[str, float]
+    encode_pool: Dict[str, float]
+    article_store: Dict[str, float]
+    ann_index: Dict[str, float]
+    admission: Dict[str, float]
+
+
+def _encode_vector(vec: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vec, dtype="<f4").tobytes()).decode("ascii")
+
+
+def _decode_vectors(items: List[ArticleVectorDTO]) -> np.ndarray:
+    rows = [np.frombuffer(base64.b64decode(it.vector), dtype="<f4") for it in items]
+    if len({r.shape[0] for r in rows}) > 1:
+        raise ValueError("All vectors must have the same dimension")
+    return np.stack(rows).astype(np.float32)
+
+
+async def _admitted(request: Request, response: Response, fn: Callable[..., Any], **kwargs: Any) -> Any:
+    """Выполняет тяжёлый вызов модели через AdmissionController в threadpool."""
+    deadline = admission.deadline_from(request.headers.get(DEADLINE_HEADER))
+    try:
+        result, timing = await admission.run(
+            fn,
+            deadline=deadline,
+            is_disconnected=request.is_disconnected,
+            **kwargs,
+        )
+    except Overloaded as e:
+        logger.warning("Request rejected: queue is full", extra={"path": request.url.path})
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after_s)})
+    except DeadlineExceeded as e:
+        logger.warning("Request dropped: deadline exceeded", extra={"path": request.url.path})
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Internal model error")
+        raise HTTPException(status_code=500, detail=f"Internal model error: {e}")
+
+    REQUEST_QUEUE_SECONDS.observe(timing.queue_wait_ms / 1000.0, endpoint=request.url.path)
+    REQUEST_COMPUTE_SECONDS.observe(timing.compute_ms / 1000.0, endpoint=request.url.path)
+    response.headers["Server-Timing"] = (
+        f"queue;dur={timing.queue_wait_ms:.1f}, compute;dur={timing.compute_ms:.1f}"
+    )
+    return result
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    if AI_PROFILER:
+        profiler.start()
+    if not AI_PRELOAD:
+        core_mark_ready()
+        return
+    # в отдельном потоке: liveness отвечает сразу, readiness — когда модель прогрета
+    threading.Thread(target=core_startup, name="ai-startup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    profiler.stop()
+    core_shutdown()
+
+
+@app.get("/health/live", response_model=HealthResponse)
+async def liveness() -> HealthResponse:
+    return HealthResponse(status="ok")
+
+
+@app.get("/health/ready", response_model=ReadinessResponse)
+def readiness(response: Response) -> ReadinessResponse:
+    state = core_readiness()
+    if state.ready:
+        status = "ok"
+    else:
+        status = "failed" if state.error else "starting"
+        response.status_code = 503
+    return ReadinessResponse(status=status, error=state.error, stages_ms=state.stages_ms)
+
+
+@app.get("/health", response_model=ReadinessResponse)
+def health_check(response: Response) -> ReadinessResponse:
+    return readiness(response)
+
+
+@app.get("/stats", response_model=StatsResponse)
+def stats_endpoint() -> StatsResponse:
+    return StatsResponse(**core_stats(), admission=admission.snapshot())
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profiler", response_class=PlainTextResponse)
+def profiler_dump() -> PlainTextResponse:
+    """Накопленные стеки в collapsed-формате (flamegraph.pl / speedscope)."""
+    return PlainTextResponse(profiler.collapsed())
+
+
+@app.post("/debug/profiler", response_model=Dict[str, float])
+def profiler_toggle(payload: ProfilerRequest) -> Dict[str, float]:
+    if payload.reset:
+        profiler.reset()
+    if payload.enabled:
+        profiler.start(payload.interval_ms)
+    else:
+        profiler.stop()
+    return profiler.snapshot()
 
 
 @app.post("/recommend", response_model=RecommendResponse)
-def recommend_endpoint(payload: RecommendRequest) -> RecommendResponse:
+async def recommend_endpoint(payload: RecommendRequest, request: Request, response: Response) -> RecommendResponse:
     logger.info(
         "POST /recommend called",
         extra={
@@ -61,18 +284,121 @@ def recommend_endpoint(payload: RecommendRequest) -> RecommendResponse:
         },
     )
 
-    try:
-        result: RecommendationResult = core_recommend(
-            liked_texts=payload.liked_texts,
-            disliked_texts=payload.disliked_texts,
-            candidate_news=payload.candidate_news,
-            top_k=payload.top_k,
+    result: RecommendationResult = await _admitted(
+        request,
+        response,
+        core_recommend,
+        liked_texts=payload.liked_texts,
+        disliked_texts=payload.disliked_texts,
+        candidate_news=payload.candidate_news,
+        top_k=payload.top_k,
+    )
+
+    items_dto = [RecommendedItemDTO(index=i.index, score=i.score) for i in result.items]
+    return RecommendResponse(items=items_dto)
+
+
+@app.post("/articles/embed", response_model=EmbedArticlesResponse)
+async def embed_articles_endpoint(
+    payload: EmbedArticlesRequest, request: Request, response: Response
+) -> EmbedArticlesResponse:
+    logger.info("POST /articles/embed called", extra={"items_count": len(payload.items)})
+
+    ids = [it.id for it in payload.items]
+    vectors = await _admitted(request, response, core_embed_articles, article_ids=ids, texts=[it.text for it in payload.items])
+
+    dim = int(vectors.shape[1]) if vectors.ndim == 2 else 0
+    items = [ArticleVectorDTO(id=i, vector=_encode_vector(v)) for i, v in zip(ids, vectors)]
+    return EmbedArticlesResponse(model_name=core_model_name(), dim=dim, items=items)
+
+
+@app.post("/articles/vectors", response_model=UpsertVectorsResponse)
+def upsert_vectors_endpoint(payload: UpsertVectorsRequest) -> UpsertVectorsResponse:
+    if payload.model_name != core_model_name():
+        raise HTTPException(
+            status_code=409,
+            detail=f"Vectors were produced by {payload.model_name}, service uses {core_model_name()}",
         )
+    if not payload.items:
+        return UpsertVectorsResponse(stored=0)
+
+    try:
+        vectors = _decode_vectors(payload.items)
+        core_upsert_article_vectors([it.id for it in payload.items], vectors)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logger.exception("Internal model error")
-        raise HTTPException(status_code=500, detail=f"Internal model error: {e}")
 
-    items_dto = [RecommendedItemDTO(index=i.index, score=i.score) for i in result.items]
-    return RecommendResponse(items=items_dto)
+    return UpsertVectorsResponse(stored=len(payload.items))
+
+
+@app.post("/recommend/ids", response_model=RecommendByIdsResponse)
+async def recommend_by_ids_endpoint(
+    payload: RecommendByIdsRequest, request: Request, response: Response
+) -> RecommendByIdsResponse:
+    logger.info(
+        "POST /recommend/ids called",
+        extra={
+            "liked_count": len(payload.liked_ids),
+            "disliked_count": len(payload.disliked_ids),
+            "candidates_count": None if payload.candidate_ids is None else len(payload.candidate_ids),
+            "candidate_limit": payload.candidate_limit,
+            "top_k": payload.top_k,
+            "has_user_vector": payload.user_vector is not None,
+        },
+    )
+
+    if payload.user_vector is None and not payload.liked_ids:
+        raise HTTPException(status_code=400, detail="Either liked_ids or user_vector is required")
+
+    user_vector = None
+    if payload.user_vector is not None:
+        try:
+            user_vector = np.frombuffer(base64.b64decode(payload.user_vector), dtype="<f4").astype(np.float32)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid user_vector: {e}")
+
+    result: RecommendationByIdsResult = await _admitted(
+        request,
+        response,
+        core_recommend_by_ids,
+        liked_ids=payload.liked_ids,
+        disliked_ids=payload.disliked_ids,
+        candidate_ids=payload.candidate_ids,
+        top_k=payload.top_k,
+        exclude_ids=payload.exclude_ids,
+        candidate_limit=payload.candidate_limit,
+        user_vector=user_vector,
+    )
+
+    return RecommendByIdsResponse(
+        items=[RecommendedArticleDTO(article_id=i.article_id, score=i.score) for i in result.items],
+        missing_ids=result.missing_ids,
+    )
+
+
+@app.post("/recommend/batch", response_model=RecommendBatchResponse)
+async def recommend_batch_endpoint(
+    payload: RecommendBatchRequest, request: Request, response: Response
+) -> RecommendBatchResponse:
+    logger.info(
+        "POST /recommend/batch called",
+        extra={
+            "users_count": len(payload.users),
+            "candidates_count": len(payload.candidate_news),
+            "top_k": payload.top_k,
+        },
+    )
+
+    results = await _admitted(
+        request,
+        response,
+        core_recommend_batch,
+        users=[UserTexts(liked_texts=u.liked_texts, disliked_texts=u.disliked_texts) for u in payload.users],
+        candidate_news=payload.candidate_news,
+        top_k=payload.top_k,
+    )
+
+    return RecommendBatchResponse(results=[
+        RecommendResponse(items=[RecommendedItemDTO(index=i.index, score=i.score) for i in r.items])
+        for r in results
+    ])
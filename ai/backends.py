@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "stub")
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_META_FILE = "encoder.json"
+
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+class TorchBackend:
+    """SentenceTransformer на PyTorch — исходное поведение EmbeddingModel."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str) -> None:
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    @property
+    def dim(self) -> int:
+        return int(self.model.get_sentence_embedding_dimension())
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return int(self.model.max_seq_length)
+
+    def encode(self, texts: List[str], normalize: bool) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+        )
+
+
+class OnnxBackend:
+    """Тот же трансформер, экспортированный в ONNX (см. ai.onnx_export), на onnxruntime CPU.
+
+    Токенизация — сохранённым рядом HF-токенайзером, пулинг (mean/cls) повторяет
+    sentence-transformers, поэтому контракт encode() тот же, что у TorchBackend.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, intra_op_threads: int = 0) -> None:
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "onnx backend requires onnxruntime and transformers: pip install onnxruntime transformers"
+            ) from e
+
+        meta_path = os.path.join(model_dir, ONNX_META_FILE)
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path) or not os.path.exists(meta_path):
+            raise FileNotFoundError(
+                f"ONNX encoder not found in {model_dir}; run `python -m ai.onnx_export --output {model_dir}`"
+            )
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = int(self.meta.get("max_seq_length", 256))
+        self.pooling = self.meta.get("pooling", "mean")
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta["dim"])
+
+    def encode(self, texts: List[str], normalize: bool) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        enc = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feed = {k: v.astype(np.int64) for k, v in enc.items() if k in self._input_names}
+        hidden = self.session.run(None, feed)[0]  # (B, T, H)
+
+        if self.pooling == "cls":
+            emb = hidden[:, 0]
+        else:
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        emb = emb.astype(np.float32)
+        return _l2_normalize(emb) if normalize else emb
+
+
+class StubBackend:
+    """Детерминированный энкодер без модели: feature hashing слов в dim-мерный вектор.
+
+    Для бенчмарков и проверок пайплайна офлайн (ai.bench.suite): похожие тексты
+    дают близкие векторы, результат не зависит от процесса и запуска.
+    """
+
+    name = "stub"
+
+    def __init__(self, dim: int = 384, max_seq_length: int = 256) -> None:
+        self._dim = dim
+        self.max_seq_length = max_seq_length
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self._dim, dtype=np.float32)
+        for word in text.split()[: self.max_seq_length]:
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self._dim] += 1.0 if (h >> 32) & 1 else -1.0
+        return vec
+
+    def encode(self, texts: List[str], normalize: bool) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self._dim), dtype=np.float32)
+        emb = np.stack([self._embed(t) for t in texts])
+        return _l2_normalize(emb) if normalize else emb
+
+
+def create_backend(
+    backend: str,
+    model_name: str,
+    onnx_dir: Optional[str] = None,
+    intra_op_threads: int = 0,
+):
+    if backend == "torch":
+        return TorchBackend(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        if not onnx_dir:
+            raise ValueError("EMBEDDING_ONNX_DIR must be set for the onnx backends")
+        return OnnxBackend(onnx_dir, quantized=backend == "onnx-int8", intra_op_threads=intra_op_threads)
+    if backend == "stub":
+        return StubBackend(dim=int(os.getenv("EMBEDDING_STUB_DIM", "384")))
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}")
+
+
+def parity(reference, candidate, texts: Sequence[str], normalize: bool = True) -> np.ndarray:
+    """Косинус между эмбеддингами двух бэкендов для каждого текста."""
+    a = _l2_normalize(np.asarray(reference.encode(list(texts), normalize), dtype=np.float32))
+    b = _l2_normalize(np.asarray(candidate.encode(list(texts), normalize), dtype=np.float32))
+    return (a * b).sum(axis=1)
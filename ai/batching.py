@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class BatcherConfig:
+    # 0 -> батчер выключен, каждый вызов кодирует сам
+    max_wait_ms: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+    max_batch_size: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: "Future[np.ndarray]"
+
+
+@dataclass
+class BatcherStats:
+    requests: int = 0
+    batches: int = 0
+    texts: int = 0
+    last_batch_size: int = 0
+    max_batch_size: int = 0
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.texts / self.batches if self.batches else 0.0
+
+
+class EncodeBatcher:
+    """Склеивает тексты из параллельных запросов в один forward pass.
+
+    Фоновый поток ждёт первый запрос, затем до max_wait_ms добирает следующие
+    (или пока не наберётся max_batch_size текстов), кодирует всё одним вызовом
+    encode_fn и раздаёт строки результата обратно вызывающим.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        config: Optional[BatcherConfig] = None,
+    ) -> None:
+        self.config = config or BatcherConfig()
+        self.stats = BatcherStats()
+        self._encode_fn = encode_fn
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._pending_texts = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Сколько текстов ждут кодирования (в очереди и в текущем батче)."""
+        return self._pending_texts
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return self._encode_fn(texts)
+        self._ensure_started()
+        req = _Request(texts=list(texts), future=Future())
+        with self._lock:
+            self._pending_texts += len(texts)
+            self.stats.requests += 1
+        self._queue.put(req)
+        return req.future.result()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.config.max_wait_ms / 1000.0
+        while size < self.config.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(req)
+            size += len(req.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            texts = [t for req in batch for t in req.texts]
+            try:
+                embeddings = self._encode_fn(texts)
+            except Exception as e:
+                logger.exception("Batched encode failed", extra={"batch_size": len(texts)})
+                for req in batch:
+                    req.future.set_exception(e)
+            else:
+                offset = 0
+                for req in batch:
+                    n = len(req.texts)
+                    req.future.set_result(embeddings[offset : offset + n])
+                    offset += n
+            finally:
+                with self._lock:
+                    self._pending_texts -= len(texts)
+                    self.stats.batches += 1
+                    self.stats.texts += len(texts)
+                    self.stats.last_batch_size = len(texts)
+                    self.stats.max_batch_size = max(self.stats.max_batch_size, len(texts))
+
+            logger.debug(
+                "Encoded batch",
+                extra={"batch_size": len(texts), "requests": len(batch), "queue_depth": self.queue_depth},
+            )
+
+    def snapshot(self) -> Dict[str, float]:
+        s = self.stats
+        return {
+            "enabled": 1,
+            "queue_depth": self.queue_depth,
+            "requests": s.requests,
+            "batches": s.batches,
+            "texts": s.texts,
+            "avg_batch_size": s.avg_batch_size,
+            "last_batch_size": s.last_batch_size,
+            "max_batch_size": s.max_batch_size,
+        }
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from ai.embeddings import EmbendingConfig
+from ai.pool import EncodingPool, EncodingPoolConfig
+
+
+def _texts(n: int, words: int) -> List[str]:
+    return [" ".join(f"anime{(i * 7 + j) % 997} news{j}" for j in range(words)) for i in range(n)]
+
+
+def run(processes: List[int], threads: int, n_texts: int, words: int, backend: str, model_name: str) -> List[Dict[str, float]]:
+    texts = _texts(n_texts, words)
+    onnx_dir = os.getenv("EMBEDDING_ONNX_DIR") or None
+    results: List[Dict[str, float]] = []
+    for p in processes:
+        pool = EncodingPool(
+            backend,
+            model_name,
+            normalize=True,
+            onnx_dir=onnx_dir,
+            config=EncodingPoolConfig(processes=p, threads_per_process=threads, min_texts=0),
+        )
+        try:
+            t0 = time.perf_counter()
+            pool.start()
+            startup_s = time.perf_counter() - t0
+
+            pool.encode(texts[: min(64, len(texts))])  # прогрев
+            t0 = time.perf_counter()
+            pool.encode(texts)
+            elapsed = time.perf_counter() - t0
+        finally:
+            pool.close()
+        results.append({
+            "processes": p,
+            "threads_per_process": threads,
+            "texts": n_texts,
+            "startup_s": startup_s,
+            "elapsed_s": elapsed,
+            "texts_per_s": n_texts / elapsed,
+        })
+    base = results[0]["texts_per_s"] if results else 0.0
+    for r in results:
+        r["speedup"] = r["texts_per_s"] / base if base else 0.0
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Масштабирование EncodingPool по числу процессов")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--texts", type=int, default=2048)
+    parser.add_argument("--words", type=int, default=64)
+    parser.add_argument("--backend", default=EmbendingConfig.backend)
+    parser.add_argument("--model", default=EmbendingConfig.model_name)
+    args = parser.parse_args()
+    print(json.dumps(run(sorted(set(args.processes)), args.threads, args.texts, args.words, args.backend, args.model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
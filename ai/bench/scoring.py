@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Dict, List
+
+import numpy as np
+
+from ai.scoring import ScoringEngine
+
+from .common import timeit as _timeit
+
+
+def _full_sort_baseline(user: np.ndarray, cand: np.ndarray, k: int) -> np.ndarray:
+    # то, что делал rank_candidates раньше: все скоры + полный argsort
+    scores = cand @ user
+    return np.argsort(scores)[::-1][:k]
+
+
+def run(sizes: List[int], dim: int, top_k: int, users: int, seed: int = 0) -> List[Dict[str, object]]:
+    rng = np.random.default_rng(seed)
+    engine = ScoringEngine()
+    results: List[Dict[str, object]] = []
+
+    for n in sizes:
+        cand = rng.standard_normal((n, dim)).astype(np.float32)
+        cand /= np.linalg.norm(cand, axis=1, keepdims=True)
+        user_batch = rng.standard_normal((users, dim)).astype(np.float32)
+        user_batch /= np.linalg.norm(user_batch, axis=1, keepdims=True)
+        repeat = 50 if n <= 10_000 else 5
+
+        results.append({
+            "n": n,
+            "dim": dim,
+            "top_k": top_k,
+            "full_sort_1_user": _timeit(lambda: _full_sort_baseline(user_batch[0], cand, top_k), repeat),
+            "engine_1_user": _timeit(lambda: engine.top_k(user_batch[0], cand, top_k), repeat),
+            f"engine_{users}_users": _timeit(lambda: engine.top_k(user_batch, cand, top_k), repeat),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк ScoringEngine.top_k")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 10_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--users", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(run(args.sizes, args.dim, args.top_k, args.users), indent=2))
+
+
+if __name__ == "__main__":
+    main()
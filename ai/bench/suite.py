@@ -0,0 +1,219 @@
+"""Воспроизводимый набор микробенчмарков ai-пайплайна.
+
+    python -m ai.bench.suite --backend stub --output bench.json
+    python -m ai.bench.suite --backend torch --output new.json --compare bench.json
+
+Бэкенд stub не требует модели и сети; torch/onnx берут модель из локального
+кэша/EMBEDDING_MODEL_PATH (HF_HUB_OFFLINE=1 выставляется автоматически).
+Результат — JSON со стабильными именами замеров, --compare сравнивает p50
+с прошлым прогоном и завершается с ошибкой при регрессии больше --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from .common import environment, timeit
+
+LIKED = [
+    "The new season of Jujutsu Kaisen has officially been announced",
+    "A new trailer for the upcoming Demon Slayer arc has been released",
+]
+DISLIKED = ["A new gacha mobile game based on a famous anime franchise has been revealed"]
+
+QUICK = {
+    "batch_sizes": [1, 32],
+    "words": [16, 128],
+    "liked_counts": [5, 50],
+    "rank_sizes": [50, 10_000],
+    "recommend_candidates": [50],
+    "repeat": 5,
+}
+FULL = {
+    "batch_sizes": [1, 8, 32, 128],
+    "words": [16, 64, 256],
+    "liked_counts": [5, 50, 500],
+    "rank_sizes": [50, 1_000, 10_000, 100_000, 1_000_000],
+    "recommend_candidates": [50, 200, 1_000],
+    "repeat": 20,
+}
+
+
+def _texts(n: int, words: int, seed: int) -> List[str]:
+    rng = np.random.default_rng(seed)
+    vocab = [f"anime{i}" for i in range(5_000)]
+    return [" ".join(vocab[j] for j in rng.integers(0, len(vocab), words)) for _ in range(n)]
+
+
+def _entry(name: str, timing: Dict[str, float], **params: object) -> Dict[str, object]:
+    return {"name": name, **params, **timing}
+
+
+def bench_encode(cfg: Dict, backend: str, seed: int) -> List[Dict[str, object]]:
+    from ai.batching import BatcherConfig
+    from ai.embeddings import EmbeddingModel, EmbendingConfig
+
+    # без кэша и микро-батчера: меряем сам forward
+    model = EmbeddingModel(EmbendingConfig(backend=backend, cache_max_entries=0, batching=BatcherConfig(max_wait_ms=0)))
+    model.load()
+    out = []
+    for words in cfg["words"]:
+        for batch in cfg["batch_sizes"]:
+            texts = _texts(batch, words, seed)
+            t = timeit(lambda: model.encode(texts), cfg["repeat"])
+            t["texts_per_s"] = batch / (t["p50_ms"] / 1000.0) if t["p50_ms"] else 0.0
+            out.append(_entry(f"encode/words={words}/batch={batch}", t, batch=batch, words=words))
+
+    # смешанные длины: здесь видна польза сортировки по длине
+    mixed = _texts(96, 16, seed) + _texts(32, 256, seed + 1)
+    t = timeit(lambda: model.encode(mixed), cfg["repeat"])
+    t["texts_per_s"] = len(mixed) / (t["p50_ms"] / 1000.0) if t["p50_ms"] else 0.0
+    out.append(_entry("encode/mixed/batch=128", t, batch=len(mixed)))
+    return out
+
+
+def bench_profile(cfg: Dict, dim: int, seed: int) -> List[Dict[str, object]]:
+    from ai.profile import UserProfileBuilder
+
+    rng = np.random.default_rng(seed)
+    builder = UserProfileBuilder()
+    out = []
+    for n in cfg["liked_counts"]:
+        liked = rng.standard_normal((n, dim), dtype=np.float32)
+        disliked = rng.standard_normal((max(n // 5, 1), dim)).astype(np.float32)
+        t = timeit(lambda: builder.build(liked, disliked), cfg["repeat"] * 5)
+        out.append(_entry(f"profile/build/liked={n}", t, liked=n))
+
+    users = 64
+    counts = rng.integers(1, 50, users)
+    liked = rng.standard_normal((int(counts.sum()), dim)).astype(np.float32)
+    t = timeit(lambda: builder.build_many(liked, counts), cfg["repeat"] * 5)
+    out.append(_entry(f"profile/build_many/users={users}", t, users=users))
+    return out
+
+
+def bench_rank(cfg: Dict, backend: str, dim: int, seed: int) -> List[Dict[str, object]]:
+    from ai.batching import BatcherConfig
+    from ai.embeddings import EmbeddingModel, EmbendingConfig
+    from ai.recommender import NewsRecommender
+
+    rng = np.random.default_rng(seed)
+    rec = NewsRecommender(embedding_model=EmbeddingModel(
+        EmbendingConfig(backend=backend, cache_max_entries=0, batching=BatcherConfig(max_wait_ms=0))
+    ))
+    user = rng.standard_normal(dim, dtype=np.float32)
+    user /= np.linalg.norm(user)
+
+    out = []
+    for n in cfg["rank_sizes"]:
+        # скоринг + top-k по готовым эмбеддингам: кодировать 1M текстов на каждый замер бессмысленно
+        cand = rng.standard_normal((n, dim), dtype=np.float32)
+        cand /= np.linalg.norm(cand, axis=1, keepdims=True)
+        repeat = cfg["repeat"] if n <= 100_000 else max(cfg["repeat"] // 4, 3)
+        t = timeit(lambda: rec.rank_embeddings(user, cand, top_k=5), repeat)
+        out.append(_entry(f"rank/embeddings/n={n}", t, n=n))
+
+    # rank_candidates целиком (очистка + encode + скоринг) на реалистичных размерах
+    for n in [x for x in cfg["rank_sizes"] if x <= 1_000]:
+        texts = _texts(n, 32, seed)
+        t = timeit(lambda: rec.rank_candidates(user, texts, top_k=5), max(cfg["repeat"] // 2, 3))
+        out.append(_entry(f"rank/candidates/n={n}", t, n=n))
+    return out
+
+
+def bench_recommend(cfg: Dict, seed: int) -> List[Dict[str, object]]:
+    from ai import model_core
+
+    out = []
+    for n in cfg["recommend_candidates"]:
+        cands = _texts(n, 48, seed + n)
+        # cold: каждый замер на новых кандидатах (мимо кэша эмбеддингов)
+        fresh = itertools.count()
+        t = timeit(
+            lambda: model_core.recommend(LIKED, DISLIKED, [f"{c} v{next(fresh)}" for c in cands]),
+            max(cfg["repeat"] // 2, 3),
+        )
+        out.append(_entry(f"recommend/cold/candidates={n}", t, candidates=n))
+        t = timeit(lambda: model_core.recommend(LIKED, DISLIKED, cands), cfg["repeat"])
+        out.append(_entry(f"recommend/warm/candidates={n}", t, candidates=n))
+    return out
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, min_ms: float = 0.1) -> List[Dict[str, object]]:
+    """Замеры, у которых p50 вырос больше чем на tolerance относительно baseline.
+
+    Совсем короткие замеры (меньше min_ms в обоих прогонах) шумят сильнее любого допуска и пропускаются.
+    """
+    base = {e["name"]: e for section in baseline["results"].values() for e in section}
+    regressions = []
+    for section in current["results"].values():
+        for e in section:
+            b = base.get(e["name"])
+            if not b or not b.get("p50_ms") or max(b["p50_ms"], e["p50_ms"]) < min_ms:
+                continue
+            ratio = e["p50_ms"] / b["p50_ms"]
+            if ratio > 1.0 + tolerance:
+                regressions.append({"name": e["name"], "baseline_p50_ms": b["p50_ms"], "p50_ms": e["p50_ms"], "ratio": ratio})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки ai: encode, профиль, ранжирование, recommend end-to-end")
+    parser.add_argument("--backend", default="stub", help="stub | torch | onnx | onnx-int8")
+    parser.add_argument("--quick", action="store_true", help="урезанная матрица параметров (для CI)")
+    parser.add_argument("--only", nargs="+", choices=["encode", "profile", "rank", "recommend"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-ms", type=float, default=0.1, help="замеры короче не сравниваются")
+    args = parser.parse_args()
+
+    # конфиги ai читают окружение при импорте, поэтому выставляем его до импорта ai.*
+    os.environ["EMBEDDING_BACKEND"] = args.backend
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    from ai import model_core
+
+    cfg = QUICK if args.quick else FULL
+    sections = args.only or ["encode", "profile", "rank", "recommend"]
+    dim = model_core.get_recommender().embedding_model.encode(["dim probe"]).shape[1]
+
+    results: Dict[str, List[Dict[str, object]]] = {}
+    if "encode" in sections:
+        results["encode"] = bench_encode(cfg, args.backend, args.seed)
+    if "profile" in sections:
+        results["profile"] = bench_profile(cfg, dim, args.seed)
+    if "rank" in sections:
+        results["rank"] = bench_rank(cfg, args.backend, dim, args.seed)
+    if "recommend" in sections:
+        results["recommend"] = bench_recommend(cfg, args.seed)
+
+    report = {
+        "meta": {**environment(), "backend": args.backend, "dim": int(dim), "quick": args.quick, "seed": args.seed},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_ms)
+        print(json.dumps({"regressions": regressions}, indent=2))
+        if regressions:
+            raise SystemExit(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def embedding_cache_key(model_name: str, normalize: bool, text: str, token_truncation: bool = False) -> str:
+    # text — исходный (не усечённый) текст, поэтому режим усечения — часть ключа
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(b"1" if normalize else b"0")
+    h.update(b"1" if token_truncation else b"0")
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _DiskTier:
+    """sqlite-файл key -> float32 вектор, переживает рестарт контейнера."""
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        out: Dict[str, np.ndarray] = {}
+        # sqlite ограничивает число параметров в одном запросе
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                out[key] = np.frombuffer(blob, dtype=np.float32)
+        return out
+
+    def put_many(self, items: Iterable[tuple[str, np.ndarray]]) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+            [(k, np.ascontiguousarray(v, dtype=np.float32).tobytes()) for k, v in items],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class EmbeddingCache:
+    """Двухуровневый кэш эмбеддингов: LRU в памяти + (опционально) sqlite на диске."""
+
+    def __init__(self, max_entries: int = 20_000, cache_dir: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+
+        if cache_dir:
+            try:
+                self._disk = _DiskTier(os.path.join(cache_dir, "embeddings.sqlite3"))
+                logger.info("Embedding disk cache enabled", extra={"cache_dir": cache_dir})
+            except Exception:
+                logger.exception("Failed to open embedding disk cache", extra={"cache_dir": cache_dir})
+                self._disk = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing: List[str] = []
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is None:
+                    missing.append(key)
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = vec
+                self.stats.memory_hits += 1
+
+            if missing and self._disk is not None:
+                try:
+                    from_disk = self._disk.get_many(missing)
+                except Exception:
+                    logger.exception("Embedding disk cache read failed")
+                    from_disk = {}
+                for key, vec in from_disk.items():
+                    self._remember(key, vec)
+                    found[key] = vec
+                self.stats.disk_hits += len(from_disk)
+                self.stats.misses += len(missing) - len(from_disk)
+            else:
+                self.stats.misses += len(missing)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            for key, vec in items.items():
+                self._remember(key, vec)
+            if self._disk is not None:
+                try:
+                    self._disk.put_many(items.items())
+                except Exception:
+                    logger.exception("Embedding disk cache write failed")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
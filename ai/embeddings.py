@@ -1,30 +1,94 @@
-from dataclasses import dataclass
-from typing import Optional, Sequence
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from shared.logging import *
 
+from .backends import create_backend
+from .batching import BatcherConfig, EncodeBatcher
+from .cache import EmbeddingCache, embedding_cache_key
+from .metrics import ENCODE_BATCH_SIZE, stage
+from .pool import EncodingPool, EncodingPoolConfig
+from .preprocess import TokenTruncator, encode_by_length
+
 logger = get_logger(__name__)
 
+WARMUP_TEXTS = [
+    "warmup short text",
+    "A new trailer for the upcoming anime season has been released with the first key visual",
+]
+
+
 @dataclass
 class EmbendingConfig:
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # локальный снапшот модели (SentenceTransformer.save) — не ходим в HF Hub на старте
+    model_path: Optional[str] = field(default_factory=lambda: os.getenv("EMBEDDING_MODEL_PATH") or None)
     normalize: bool = True
+    cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+    cache_dir: Optional[str] = field(default_factory=lambda: os.getenv("EMBEDDING_CACHE_DIR") or None)
+    batching: BatcherConfig = field(default_factory=BatcherConfig)
+    # torch | onnx | onnx-int8 (onnx-модели собираются `python -m ai.onnx_export`) | stub (детерминированный, для бенчмарков)
+    backend: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    onnx_dir: Optional[str] = field(default_factory=lambda: os.getenv("EMBEDDING_ONNX_DIR") or None)
+    intra_op_threads: int = int(os.getenv("EMBEDDING_INTRA_OP_THREADS", "0"))
+    pool: EncodingPoolConfig = field(default_factory=EncodingPoolConfig)
+    # тексты сортируются по длине и кодируются корзинами такого размера
+    encode_batch_size: int = int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", "32"))
+    # обрезать тексты по токенам до max_seq_length модели до кэша и encode
+    token_truncation: bool = os.getenv("EMBEDDING_TOKEN_TRUNCATION", "1") == "1"
+
+    @property
+    def cache_namespace(self) -> str:
+        # у onnx-int8 векторы чуть отличаются — не смешиваем их в кэше с torch
+        if self.backend == "torch":
+            return self.model_name
+        return f"{self.model_name}#{self.backend}"
 class EmbeddingModel:
     def __init__(self, config: Optional[EmbendingConfig] = None) -> None:
         self.config = config or EmbendingConfig()
-        self._model: Optional[SentenceTransformer] = None
+        self._model = None
+        self._truncator: Optional[TokenTruncator] = None
+        self.cache: Optional[EmbeddingCache] = None
+        if self.config.cache_max_entries > 0:
+            self.cache = EmbeddingCache(
+                max_entries=self.config.cache_max_entries,
+                cache_dir=self.config.cache_dir,
+            )
+        self.batcher: Optional[EncodeBatcher] = None
+        if self.config.batching.max_wait_ms > 0:
+            self.batcher = EncodeBatcher(self._encode_uncached, self.config.batching)
+        self.pool: Optional[EncodingPool] = None
+        if self.config.pool.processes > 0:
+            self.pool = EncodingPool(
+                self.config.backend,
+                self.config.model_path or self.config.model_name,
+                self.config.normalize,
+                onnx_dir=self.config.onnx_dir,
+                config=self.config.pool,
+                batch_size=self.config.encode_batch_size,
+            )
 
-    def _load_model(self) -> SentenceTransformer:
+    def _load_model(self):
         if self._model is None:
             logger.info(
                 "Loading embedding model",
-                extra={"model_name": self.config.model_name}
+                extra={"model_name": self.config.model_name, "backend": self.config.backend}
             )
             try:
-                self._model = SentenceTransformer(self.config.model_name)
-                logger.info("Embedding model loaded successfully")
+                self._model = create_backend(
+                    self.config.backend,
+                    self.config.model_path or self.config.model_name,
+                    onnx_dir=self.config.onnx_dir,
+                    intra_op_threads=self.config.intra_op_threads,
+                )
+                if self.config.token_truncation:
+                    self._truncator = TokenTruncator.for_backend(self._model)
+                logger.info(
+                    "Embedding model loaded successfully",
+                    extra={"token_truncation": self._truncator is not None}
+                )
             except Exception:
                 logger.exception(
                     "Failed to load embedding model",
@@ -33,22 +97,28 @@ class EmbeddingModel:
                 raise
 
         return self._model
-    
-    def encode(self, text: Sequence[str]) -> np.ndarray:
-
-        logger.debug(
-            "Encoding texts",
-            extra={"texts_count": len(text), "normalize": self.config.normalize}
-        )
 
-        model = self._load_model()
+    def _encode_uncached(self, text: Sequence[str]) -> np.ndarray:
+        texts = list(text)
+        use_pool = self.pool is not None and len(texts) >= self.config.pool.min_texts
+        model = None if use_pool else self._load_model()
+        ENCODE_BATCH_SIZE.observe(len(texts))
 
         try:
-            embeddings: np.ndarray = model.encode(
-                list(text),
-                convert_to_numpy=True,
-                normalize_embeddings=self.config.normalize,
-            )
+            if use_pool:
+                with stage("encode_pool"):
+                    # шарды пула непрерывные: после сортировки каждый воркер получает тексты близкой длины
+                    order = np.argsort([len(t) for t in texts], kind="stable")
+                    sorted_emb = self.pool.encode([texts[i] for i in order])
+                    embeddings = np.empty_like(sorted_emb)
+                    embeddings[order] = sorted_emb
+            else:
+                with stage("encode_model"):
+                    embeddings = encode_by_length(
+                        lambda batch: model.encode(batch, self.config.normalize),
+                        texts,
+                        self.config.encode_batch_size,
+                    )
         except Exception:
             logger.exception(
                 "Failed to encode text",
@@ -56,10 +126,110 @@ class EmbeddingModel:
             )
             raise
 
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode_batched(self, text: Sequence[str]) -> np.ndarray:
+        if self.batcher is None:
+            return self._encode_uncached(text)
+        return self.batcher.submit(list(text))
+
+    def truncate(self, text: Sequence[str]) -> Sequence[str]:
+        if not self.config.token_truncation or not text:
+            return text
+        self._load_model()
+        if self._truncator is None:
+            return text
+        with stage("truncate"):
+            return self._truncator.truncate(text)
+
+    def encode(self, text: Sequence[str]) -> np.ndarray:
+        # ключ кэша — исходный текст: полностью закэшированный запрос не токенизируется
+        # и не грузит модель, усечение — только для промахов
+        logger.debug(
+            "Encoding texts",
+            extra={"texts_count": len(text), "normalize": self.config.normalize}
+        )
+
+        if not text:
+            return np.zeros((0, self._load_model().dim), dtype=np.float32)
+
+        if self.cache is None:
+            embeddings = self._encode_batched(self.truncate(text))
+        else:
+            keys = [
+                embedding_cache_key(
+                    self.config.cache_namespace, self.config.normalize, t, self.config.token_truncation
+                )
+                for t in text
+            ]
+            found = self.cache.get_many(keys)
+
+            # одинаковые тексты внутри батча кодируем один раз
+            missing: Dict[str, str] = {}
+            for key, t in zip(keys, text):
+                if key not in found and key not in missing:
+                    missing[key] = t
+
+            if missing:
+                fresh = self._encode_batched(self.truncate(list(missing.values())))
+                # копии строк: срез держал бы в кэше весь батч fresh
+                new_items = {key: row.copy() for key, row in zip(missing.keys(), fresh)}
+                self.cache.put_many(new_items)
+                found.update(new_items)
+
+            embeddings = np.stack([found[k] for k in keys])
+
+            logger.debug(
+                "Embedding cache lookup",
+                extra={
+                    "texts_count": len(text),
+                    "encoded_count": len(missing),
+                    "cache_hit_rate": round(self.cache.stats.hit_rate, 4),
+                }
+            )
+
         logger.debug(
             "Successfully encoded texts",
             extra={"texts_count": len(text), "embedding_dim": embeddings.shape[-1]}
         )
 
         return embeddings
-    
\ No newline at end of file
+
+    def load(self) -> None:
+        if self.pool is not None:
+            self.pool.start()
+        self._load_model()
+
+    def warmup(self) -> None:
+        """Один прогон мимо кэша: первые forward pass-ы у torch/onnxruntime заметно медленнее."""
+        model = self._load_model()
+        model.encode(list(WARMUP_TEXTS), self.config.normalize)
+        if self.pool is not None:
+            self.pool.encode(list(WARMUP_TEXTS) * max(self.config.pool.processes, 1))
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+
+    def pool_stats(self) -> Dict[str, float]:
+        if self.pool is None:
+            return {"enabled": 0}
+        return self.pool.snapshot()
+
+    def batcher_stats(self) -> Dict[str, float]:
+        if self.batcher is None:
+            return {"enabled": 0}
+        return self.batcher.snapshot()
+
+    def cache_stats(self) -> Dict[str, float]:
+        if self.cache is None:
+            return {"enabled": 0}
+        s = self.cache.stats
+        return {
+            "enabled": 1,
+            "entries": len(self.cache),
+            "memory_hits": s.memory_hits,
+            "disk_hits": s.disk_hits,
+            "misses": s.misses,
+            "hit_rate": s.hit_rate,
+        }
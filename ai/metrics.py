@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# (имя метрики, тип, help, [(labels, value)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.counts = [0] * (n_buckets + 1)  # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Гистограмма с фиксированными бакетами; observe — bisect + три сложения под локом."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(float(b) for b in buckets)
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, labels: Dict[str, str]) -> _Series:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series.setdefault(key, _Series(len(self.buckets)))
+        return series
+
+    def observe(self, value: float, **labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._get(labels)
+            s.counts[i] += 1
+            s.sum += value
+            s.count += 1
+
+    def observe_many(self, values: Iterable[float], **labels: str) -> None:
+        """Векторизованный observe для целого батча (например длин всех текстов)."""
+        arr = np.fromiter(values, dtype=np.float64)
+        if arr.size == 0:
+            return
+        counts = np.bincount(np.searchsorted(self.buckets, arr, side="left"), minlength=len(self.buckets) + 1)
+        total = float(arr.sum())
+        with self._lock:
+            s = self._get(labels)
+            for i, c in enumerate(counts.tolist()):
+                s.counts[i] += c
+            s.sum += total
+            s.count += int(arr.size)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(s.counts), s.sum, s.count) for k, s in self._series.items()]
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Гистограммы, заводимые модулями при импорте, плюс коллекторы, которые
+    на каждый scrape снимают текущее состояние (кэш, батчер, очередь) в виде gauge."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[str, Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram(name, help, buckets, labelnames)
+            return hist
+
+    def add_collector(self, fn: Callable[[], Iterable[Family]]) -> None:
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        lines: List[str] = []
+        with self._lock:
+            histograms = list(self._histograms.values())
+            collectors = list(self._collectors)
+        for hist in histograms:
+            lines.extend(hist.collect())
+        for collector in collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "ai_stage_seconds",
+    "Time spent in each recommender pipeline stage",
+    LATENCY_BUCKETS,
+    ("stage",),
+)
+ENCODE_BATCH_SIZE = REGISTRY.histogram(
+    "ai_encode_batch_size",
+    "Texts per model forward call (after cache and micro-batching)",
+    SIZE_BUCKETS,
+)
+TEXT_LENGTH_CHARS = REGISTRY.histogram(
+    "ai_text_length_chars",
+    "Length of cleaned texts sent to the encoder, in characters",
+    LENGTH_BUCKETS,
+)
+REQUEST_QUEUE_SECONDS = REGISTRY.histogram(
+    "ai_request_queue_seconds",
+    "Time a request waited for an admission slot",
+    LATENCY_BUCKETS,
+    ("endpoint",),
+)
+REQUEST_COMPUTE_SECONDS = REGISTRY.histogram(
+    "ai_request_compute_seconds",
+    "Time a request spent computing after admission",
+    LATENCY_BUCKETS,
+    ("endpoint",),
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=name)
+
+
+def gauges_from_stats(prefix: str, sections: Dict[str, Dict[str, float]]) -> List[Family]:
+    """{"embedding_cache": {"hit_rate": 0.9, ...}} -> ai_embedding_cache_hit_rate 0.9 и т.д."""
+    families: List[Family] = []
+    for section, values in sections.items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            families.append((f"{prefix}_{section}_{key}", "gauge", f"{section}.{key}", [({}, float(value))]))
+    return families
@@ -1,20 +1,154 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Optional, List, Tuple
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, List, Tuple
 import numpy as np
 
+from shared.logging import get_logger
+
 from .recommender import NewsRecommender
+from .store import ArticleVectorStore
+from .ann import IVFIndex
+from .metrics import stage
 
 _recommender: Optional[NewsRecommender] = None
+_article_store: Optional[ArticleVectorStore] = None
+_ann_index: Optional[IVFIndex] = None
+# startup() в фоновом потоке и первые запросы могут одновременно дёрнуть синглтоны
+_init_lock = threading.RLock()
+
+# каждый батч сразу дописывается в журнал стора (O(батча), с fsync), а полный снимок
+# стора и индекса — не чаще раза в ARTICLE_STORE_SAVE_INTERVAL_S (0 — на каждый батч).
+# После падения load() поднимает снимок и переигрывает журнал, векторы не теряются.
+SNAPSHOT_INTERVAL_S = float(os.getenv("ARTICLE_STORE_SAVE_INTERVAL_S", "30"))
+_snapshot_dirty = threading.Event()
+_snapshot_stop = threading.Event()
+_snapshot_lock = threading.Lock()
+_snapshot_thread: Optional[threading.Thread] = None
+
+logger = get_logger(__name__)
 
 
 def get_recommender() -> NewsRecommender:
     global _recommender
     if _recommender is None:
-        _recommender = NewsRecommender()
+        with _init_lock:
+            if _recommender is None:
+                _recommender = NewsRecommender()
     return _recommender
 
 
+def get_article_store() -> ArticleVectorStore:
+    global _article_store
+    if _article_store is None:
+        with _init_lock:
+            if _article_store is None:
+                _article_store = ArticleVectorStore()
+    return _article_store
+
+
+def get_ann_index() -> IVFIndex:
+    global _ann_index
+    if _ann_index is None:
+        with _init_lock:
+            if _ann_index is None:
+                index = IVFIndex(get_article_store())
+                index.load()
+                _ann_index = index
+    return _ann_index
+
+
+@dataclass
+class ServiceState:
+    ready: bool = False
+    error: Optional[str] = None
+    stages_ms: Dict[str, float] = field(default_factory=dict)
+
+
+_state = ServiceState()
+
+
+def readiness() -> ServiceState:
+    """Закэшированное состояние старта — без инференса, дёшево для probe."""
+    return _state
+
+
+def startup() -> None:
+    """Загрузка и прогрев всего, что иначе грузилось бы на первом запросе."""
+    def run_stage(name: str, fn: Callable[[], object]) -> None:
+        t0 = time.perf_counter()
+        fn()
+        _state.stages_ms[name] = round((time.perf_counter() - t0) * 1000.0, 1)
+        logger.info("Startup stage %s done in %.1f ms", name, _state.stages_ms[name])
+
+    t_total = time.perf_counter()
+    try:
+        run_stage("init_recommender", get_recommender)
+        run_stage("load_model", lambda: get_recommender().embedding_model.load())
+        run_stage("warmup", lambda: get_recommender().embedding_model.warmup())
+        run_stage("load_article_store", get_article_store)
+        run_stage("load_ann_index", get_ann_index)
+    except Exception as e:
+        _state.error = repr(e)
+        logger.exception("AI service startup failed")
+        return
+
+    _state.stages_ms["total"] = round((time.perf_counter() - t_total) * 1000.0, 1)
+    _state.ready = True
+    logger.info("AI service ready in %.1f ms", _state.stages_ms["total"], extra={"stages_ms": dict(_state.stages_ms)})
+
+
+def mark_ready() -> None:
+    """Для режима без предзагрузки: всё грузится лениво, сервис готов сразу."""
+    _state.ready = True
+
+
+def save_snapshot() -> None:
+    """Пишет стор и индекс на диск, если с прошлого снимка были изменения."""
+    with _snapshot_lock:
+        if not _snapshot_dirty.is_set():
+            return
+        _snapshot_dirty.clear()
+        try:
+            size = get_article_store().save()
+            get_ann_index().save(size)
+        except Exception:
+            _snapshot_dirty.set()
+            raise
+
+
+def _snapshot_loop() -> None:
+    while not _snapshot_stop.wait(SNAPSHOT_INTERVAL_S):
+        try:
+            save_snapshot()
+        except Exception:
+            logger.exception("Article store snapshot failed")
+
+
+def _schedule_snapshot() -> None:
+    global _snapshot_thread
+    if not get_article_store().config.store_dir:
+        return
+    _snapshot_dirty.set()
+    if SNAPSHOT_INTERVAL_S <= 0:
+        save_snapshot()
+        return
+    if _snapshot_thread is None:
+        with _init_lock:
+            if _snapshot_thread is None:
+                _snapshot_thread = threading.Thread(target=_snapshot_loop, name="article-store-snapshot", daemon=True)
+                _snapshot_thread.start()
+
+
+def _store_vectors(article_ids: List[int], vectors: np.ndarray) -> None:
+    store = get_article_store()
+    rows = store.upsert(article_ids, vectors, journal=True)
+    get_ann_index().add(rows)
+    _schedule_snapshot()
+
+
 @dataclass
 class RecommendedItem:
     index: int
@@ -49,12 +183,174 @@ def recommend(
     )
 
     items: List[RecommendedItem] = []
-    for idx in top_indices:
-        items.append(RecommendedItem(index=int(idx), score=float(scores[idx])))
+    for idx, score in zip(top_indices, scores):
+        items.append(RecommendedItem(index=int(idx), score=float(score)))
 
     return RecommendationResult(items=items)
 
 
+@dataclass
+class RecommendedArticle:
+    article_id: int
+    score: float
+
+
+@dataclass
+class RecommendationByIdsResult:
+    items: List[RecommendedArticle]
+    missing_ids: List[int]
+
+
+def model_name() -> str:
+    return get_recommender().embedding_model.config.model_name
+
+
+def embed_articles(article_ids: List[int], texts: List[str]) -> np.ndarray:
+    """Кодирует статьи один раз (на ingest) и кладёт векторы в стор по article_id."""
+    if len(article_ids) != len(texts):
+        raise ValueError("article_ids and texts must have the same length")
+    if not article_ids:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    rec = get_recommender()
+    vectors = rec.embed_texts(texts)
+    _store_vectors(article_ids, vectors)
+    return vectors
+
+
+def upsert_article_vectors(article_ids: List[int], vectors: np.ndarray) -> None:
+    """Загрузка уже посчитанных векторов (например из БД gateway после рестарта ai)."""
+    if not article_ids:
+        return
+    _store_vectors(article_ids, vectors)
+
+
+def recommend_by_ids(
+    liked_ids: List[int],
+    disliked_ids: List[int],
+    candidate_ids: Optional[List[int]] = None,
+    top_k: Optional[int] = None,
+    exclude_ids: Optional[List[int]] = None,
+    candidate_limit: int = 200,
+    user_vector: Optional[np.ndarray] = None,
+) -> RecommendationByIdsResult:
+    """Ранжирует статьи по сохранённым векторам.
+
+    Если candidate_ids не передан, кандидаты берутся из ANN-индекса по всему корпусу
+    (candidate_limit штук, без уже оценённых и exclude_ids), а точный rank_embeddings
+    работает как re-ranker поверх них.
+
+    user_vector — готовый профиль (инкрементально поддерживается gateway);
+    тогда liked/disliked векторы не нужны.
+    """
+    if candidate_ids is not None and not candidate_ids:
+        raise ValueError("candidate_ids cannot be empty")
+
+    rec = get_recommender()
+    store = get_article_store()
+
+    missing_ids: List[int] = []
+    if user_vector is None:
+        _, liked_emb, liked_missing = store.lookup(liked_ids)
+        _, disliked_emb, disliked_missing = store.lookup(disliked_ids)
+        missing_ids = liked_missing + disliked_missing
+
+        if liked_emb.shape[0] == 0:
+            return RecommendationByIdsResult(items=[], missing_ids=missing_ids)
+
+        user_vector = rec.build_user_vector_from_embeddings(
+            liked_emb,
+            disliked_emb if disliked_emb.shape[0] > 0 else None,
+        )
+    elif store.dim is not None and user_vector.shape[-1] != store.dim:
+        raise ValueError(f"user_vector dim {user_vector.shape[-1]} != article vectors dim {store.dim}")
+
+    if candidate_ids is None:
+        exclude = set(liked_ids) | set(disliked_ids) | set(exclude_ids or [])
+        with stage("ann_search"):
+            candidate_ids, _ = get_ann_index().search(user_vector, candidate_limit, exclude_ids=exclude)
+
+    with stage("store_lookup"):
+        cand_found, cand_emb, cand_missing = store.lookup(candidate_ids)
+    missing_ids += cand_missing
+    if not cand_found:
+        return RecommendationByIdsResult(items=[], missing_ids=missing_ids)
+
+    top_indices, scores = rec.rank_embeddings(user_vector, cand_emb, top_k=top_k)
+
+    items = [
+        RecommendedArticle(article_id=cand_found[idx], score=float(score))
+        for idx, score in zip(top_indices, scores)
+    ]
+    return RecommendationByIdsResult(items=items, missing_ids=missing_ids)
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Только по уже созданным синглтонам: scrape /metrics при AI_PRELOAD=0 не должен
+    грузить модель, стор или запускать обучение индекса. Несозданное — пустая секция."""
+    rec, store, index = _recommender, _article_store, _ann_index
+    model = None if rec is None else rec.embedding_model
+    return {
+        "embedding_cache": {} if model is None else model.cache_stats(),
+        "encode_batcher": {} if model is None else model.batcher_stats(),
+        "encode_pool": {} if model is None else model.pool_stats(),
+        "article_store": {} if store is None else {"size": len(store), "bytes": store.nbytes},
+        "ann_index": {} if index is None else {"trained": int(index.is_trained), "nlist": index.nlist},
+    }
+
+
+@dataclass
+class UserTexts:
+    liked_texts: List[str]
+    disliked_texts: List[str]
+
+
+def recommend_batch(
+    users: List[UserTexts],
+    candidate_news: List[str],
+    top_k: Optional[int] = None,
+) -> List[RecommendationResult]:
+    """Рекомендации сразу для многих пользователей на общем наборе кандидатов.
+
+    Кандидаты кодируются один раз, скоринг — одно матричное произведение (U x D) @ (D x N).
+    Пользователь без лайков получает пустой список.
+    """
+    if not candidate_news:
+        raise ValueError("candidate_news cannot be empty")
+    if not users:
+        return []
+
+    rec = get_recommender()
+
+    user_vectors = rec.build_user_vectors_from_texts(
+        liked_texts=[u.liked_texts for u in users],
+        disliked_texts=[u.disliked_texts for u in users],
+    )
+    cand_emb = rec.embed_texts(candidate_news)
+    top_indices, top_scores = rec.rank_embeddings_batch(user_vectors, cand_emb, top_k=top_k)
+
+    results: List[RecommendationResult] = []
+    for u, idx_row, score_row in zip(users, top_indices, top_scores):
+        if not u.liked_texts:
+            results.append(RecommendationResult(items=[]))
+            continue
+        results.append(RecommendationResult(items=[
+            RecommendedItem(index=int(i), score=float(sc)) for i, sc in zip(idx_row, score_row)
+        ]))
+    return results
+
+
+def shutdown() -> None:
+    _snapshot_stop.set()
+    if _article_store is not None:
+        try:
+            save_snapshot()
+        except Exception:
+            logger.exception("Article store snapshot failed")
+    if _recommender is not None:
+        _recommender.embedding_model.close()
+
+
 def self_test() -> bool:
     try:
         _ = recommend(
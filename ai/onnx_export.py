@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+from shared.logging import setup_logging, get_logger
+
+from .backends import (
+    ONNX_INT8_MODEL_FILE,
+    ONNX_META_FILE,
+    ONNX_MODEL_FILE,
+    OnnxBackend,
+    TorchBackend,
+    parity,
+)
+from .embeddings import EmbendingConfig
+
+logger = get_logger(__name__)
+
+PARITY_TEXTS = [
+    "The new season of Jujutsu Kaisen has officially been announced",
+    "A new trailer for the upcoming Demon Slayer arc has been released",
+    "One Piece confirms the release date for the next major arc",
+    "A collaboration between a popular anime and a mobile game breaks revenue records",
+    "short",
+    " ".join(["Long article body about studio production schedules and staff interviews."] * 40),
+]
+
+
+def export(model_name: str, output_dir: str, opset: int = 14) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+
+    pooling = "mean"
+    if len(st) > 1 and hasattr(st[1], "get_pooling_mode_str"):
+        pooling = "cls" if st[1].get_pooling_mode_str() == "cls" else "mean"
+
+    dummy = tokenizer(["hello world"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    dynamic_axes = {n: {0: "batch", 1: "seq"} for n in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(input_names, args))).last_hidden_state
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(transformer),
+            tuple(dummy[n] for n in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model_name": model_name,
+                "dim": int(st.get_sentence_embedding_dimension()),
+                "max_seq_length": int(st.max_seq_length),
+                "pooling": pooling,
+            },
+            f,
+            indent=2,
+        )
+    logger.info("Exported ONNX encoder", extra={"model_name": model_name, "path": model_path})
+
+
+def quantize(output_dir: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    src = os.path.join(output_dir, ONNX_MODEL_FILE)
+    dst = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+    logger.info("Quantized ONNX encoder", extra={"path": dst})
+
+
+def check(model_name: str, output_dir: str, threshold: float, threshold_int8: float) -> bool:
+    reference = TorchBackend(model_name)
+    ok = True
+    for quantized, limit in ((False, threshold), (True, threshold_int8)):
+        path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(path):
+            continue
+        backend = OnnxBackend(output_dir, quantized=quantized)
+        sims = parity(reference, backend, PARITY_TEXTS)
+        passed = bool(sims.min() >= limit)
+        ok = ok and passed
+        print(json.dumps({
+            "backend": backend.name,
+            "min_cosine": float(sims.min()),
+            "mean_cosine": float(sims.mean()),
+            "threshold": limit,
+            "passed": passed,
+        }))
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Экспорт энкодера в ONNX (+int8) и проверка паритета с torch")
+    parser.add_argument("--model", default=EmbendingConfig.model_name)
+    parser.add_argument("--output", default=os.getenv("EMBEDDING_ONNX_DIR") or "onnx_encoder")
+    parser.add_argument("--quantize", action="store_true", help="дополнительно собрать динамически квантованную int8-модель")
+    parser.add_argument("--check-only", action="store_true", help="только проверить уже экспортированные модели")
+    parser.add_argument("--threshold", type=float, default=0.995)
+    parser.add_argument("--threshold-int8", type=float, default=0.97)
+    args = parser.parse_args()
+
+    setup_logging()
+    if not args.check_only:
+        export(args.model, args.output)
+        if args.quantize:
+            quantize(args.output)
+
+    if not check(args.model, args.output, args.threshold, args.threshold_int8):
+        raise SystemExit("ONNX encoder parity check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import uuid
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class EncodingPoolConfig:
+    # 0 -> пул выключен, всё кодируется в процессе сервиса
+    processes: int = int(os.getenv("EMBEDDING_POOL_PROCESSES", "0"))
+    threads_per_process: int = int(os.getenv("EMBEDDING_POOL_THREADS", "1"))
+    # вызовы меньше этого размера дешевле закодировать локально, чем шардировать
+    min_texts: int = int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", "256"))
+    timeout_s: float = float(os.getenv("EMBEDDING_POOL_TIMEOUT_S", "300"))
+
+
+def _worker_main(
+    backend_name: str,
+    model_name: str,
+    onnx_dir: Optional[str],
+    normalize: bool,
+    batch_size: int,
+    threads: int,
+    tasks: "mp.Queue",
+    results: "mp.Queue",
+) -> None:
+    # ограничиваем intra-op потоки до импорта torch/onnxruntime
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    from ai.backends import create_backend
+    from ai.preprocess import encode_by_length
+
+    try:
+        backend = create_backend(backend_name, model_name, onnx_dir=onnx_dir, intra_op_threads=threads)
+        if backend_name == "torch":
+            try:
+                import torch
+
+                torch.set_num_threads(threads)
+            except ImportError:
+                pass
+        results.put(("ready", os.getpid(), backend.dim, None))
+    except Exception as e:
+        results.put(("ready", os.getpid(), 0, repr(e)))
+        return
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, shm_name, dim, start, texts = task
+        try:
+            emb = encode_by_length(lambda batch: backend.encode(batch, normalize), texts, batch_size)
+            # spawn-воркеры делят resource_tracker с родителем, unlink делает только родитель
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                out = np.ndarray((start + len(texts), dim), dtype=np.float32, buffer=shm.buf)
+                out[start:] = emb
+                del out
+            finally:
+                shm.close()
+            results.put((job_id, start, len(texts), None))
+        except Exception as e:
+            results.put((job_id, start, 0, repr(e)))
+
+
+class EncodingPool:
+    """N процессов с загруженной по одному разу моделью; большие encode режутся на шарды.
+
+    Строки результата воркеры пишут прямо в сегмент shared_memory задания (N x D float32),
+    через очередь передаются только тексты и короткие статусы. У каждого задания свой
+    сегмент, а статусы из общей очереди результатов раскладывает по заданиям отдельный
+    поток-диспетчер, поэтому лок держится только на постановку шардов, а несколько
+    вызовов encode обслуживаются пулом одновременно.
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        model_name: str,
+        normalize: bool,
+        onnx_dir: Optional[str] = None,
+        config: Optional[EncodingPoolConfig] = None,
+        batch_size: int = 32,
+    ) -> None:
+        self.config = config or EncodingPoolConfig()
+        self._args = (backend, model_name, onnx_dir, normalize, batch_size, max(self.config.threads_per_process, 1))
+        self._ctx = mp.get_context("spawn")
+        self._tasks: Optional["mp.Queue"] = None
+        self._results: Optional["mp.Queue"] = None
+        self._procs: List[mp.process.BaseProcess] = []
+        self._lock = threading.Lock()
+        # job_id -> очередь статусов шардов этого задания
+        self._jobs: Dict[str, "queue.Queue"] = {}
+        self._dispatcher: Optional[threading.Thread] = None
+        self.dim: Optional[int] = None
+        self.jobs = 0
+        self.texts = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._procs)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._procs:
+                return
+            self._tasks = self._ctx.Queue()
+            self._results = self._ctx.Queue()
+            for _ in range(self.config.processes):
+                p = self._ctx.Process(
+                    target=_worker_main,
+                    args=(*self._args, self._tasks, self._results),
+                    daemon=True,
+                )
+                p.start()
+                self._procs.append(p)
+
+            for _ in self._procs:
+                tag, pid, dim, err = self._results.get(timeout=self.config.timeout_s)
+                if err:
+                    self._shutdown_locked()
+                    raise RuntimeError(f"Encoding pool worker {pid} failed to load model: {err}")
+                self.dim = dim
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, args=(self._results,), name="encode-pool-results", daemon=True
+            )
+            self._dispatcher.start()
+            logger.info(
+                "Encoding pool started",
+                extra={"processes": len(self._procs), "threads_per_process": self._args[-1], "dim": self.dim},
+            )
+
+    def _dispatch(self, results: "mp.Queue") -> None:
+        while True:
+            msg = results.get()
+            if msg is None:
+                return
+            waiter = self._jobs.get(msg[0])
+            # нет ожидающего — хвост задания, упавшего по таймауту
+            if waiter is not None:
+                waiter.put(msg)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not self._procs:
+            self.start()
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        dim = int(self.dim)
+        shm = shared_memory.SharedMemory(create=True, size=n * dim * 4)
+        job_id = uuid.uuid4().hex
+        waiter: "queue.Queue" = queue.Queue()
+        try:
+            with self._lock:
+                self._jobs[job_id] = waiter
+                shards = np.array_split(np.arange(n), min(len(self._procs), n))
+                for shard in shards:
+                    start, stop = int(shard[0]), int(shard[-1]) + 1
+                    self._tasks.put((job_id, shm.name, dim, start, texts[start:stop]))
+
+            errors: List[str] = []
+            for _ in shards:
+                try:
+                    _rid, _start, _count, err = waiter.get(timeout=self.config.timeout_s)
+                except queue.Empty:
+                    raise RuntimeError("Encoding pool timed out") from None
+                if err:
+                    errors.append(err)
+            if errors:
+                raise RuntimeError(f"Encoding pool shard failed: {errors[0]}")
+
+            out = np.ndarray((n, dim), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            self._jobs.pop(job_id, None)
+            shm.close()
+            shm.unlink()
+
+        with self._lock:
+            self.jobs += 1
+            self.texts += n
+        return out
+
+    def _shutdown_locked(self) -> None:
+        for _ in self._procs:
+            self._tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self._procs = []
+        if self._dispatcher is not None:
+            self._results.put(None)
+            self._dispatcher.join(timeout=5)
+            self._dispatcher = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._procs:
+                self._shutdown_locked()
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "enabled": 1,
+            "processes": len(self._procs),
+            "threads_per_process": self._args[-1],
+            "jobs": self.jobs,
+            "texts": self.texts,
+        }
@@ -2,7 +2,13 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import Sequence, List
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# разделитель для склейки батча в одну строку: не пробельный и в новостных текстах не встречается
+_BATCH_SEP = "\x00"
 
 
 @dataclass
@@ -20,8 +26,85 @@ class TextPreprocessor:
         t = t.strip()
         if self.config.lowercase:
             t = t.lower()
-        t = re.sub(r"\s+", " ", t)
+        t = _WHITESPACE_RE.sub(" ", t)
         return t[: self.config.max_len]
 
     def clean_texts(self, texts: Sequence[str]) -> List[str]:
-        return [self.clean_text(x) for x in texts]
+        if not texts:
+            return []
+        # lower() и regex один раз на весь батч вместо вызова на каждый текст
+        joined = _BATCH_SEP.join(x or "" for x in texts)
+        if self.config.lowercase:
+            joined = joined.lower()
+        parts = _WHITESPACE_RE.sub(" ", joined).split(_BATCH_SEP)
+        if len(parts) != len(texts):
+            # разделитель оказался внутри какого-то текста
+            return [self.clean_text(x) for x in texts]
+        max_len = self.config.max_len
+        return [p.strip()[:max_len] for p in parts]
+
+
+class TokenTruncator:
+    """Обрезка текстов по токенам токенайзера модели, а не по символам.
+
+    Всё, что дальше max_seq_length, модель всё равно отбрасывает; обрезанный текст
+    короче токенизируется при encode и даёт один ключ кэша для текстов с общим началом.
+    Нужен fast-токенайзер (offset mapping).
+    """
+
+    def __init__(self, tokenizer, max_seq_length: int) -> None:
+        self.tokenizer = tokenizer
+        self.max_tokens = max(int(max_seq_length) - tokenizer.num_special_tokens_to_add(pair=False), 1)
+
+    @classmethod
+    def for_backend(cls, backend) -> Optional["TokenTruncator"]:
+        tokenizer = getattr(backend, "tokenizer", None)
+        max_seq_length = getattr(backend, "max_seq_length", None)
+        if tokenizer is None or not max_seq_length or not getattr(tokenizer, "is_fast", False):
+            return None
+        return cls(tokenizer, max_seq_length)
+
+    def truncate(self, texts: Sequence[str]) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return texts
+        enc = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.max_tokens,
+            return_offsets_mapping=True,
+        )
+        out = []
+        for t, ids, offsets in zip(texts, enc["input_ids"], enc["offset_mapping"]):
+            if len(ids) >= self.max_tokens and offsets:
+                t = t[: offsets[-1][1]]
+            out.append(t)
+        return out
+
+
+def encode_by_length(
+    encode_fn: Callable[[List[str]], np.ndarray],
+    texts: Sequence[str],
+    batch_size: int,
+) -> np.ndarray:
+    """Кодирует тексты батчами близкой длины и возвращает строки в исходном порядке.
+
+    Батч паддится до самого длинного текста в нём, поэтому одна длинная статья
+    среди коротких заголовков раздувает весь батч; после сортировки по длине
+    паддинг остаётся только внутри корзины.
+    """
+    texts = list(texts)
+    n = len(texts)
+    if n <= batch_size or batch_size <= 0:
+        return np.asarray(encode_fn(texts), dtype=np.float32)
+
+    order = np.argsort(np.fromiter((len(t) for t in texts), dtype=np.int64, count=n), kind="stable")
+    out: Optional[np.ndarray] = None
+    for start in range(0, n, batch_size):
+        idx = order[start : start + batch_size]
+        emb = np.asarray(encode_fn([texts[i] for i in idx]), dtype=np.float32)
+        if out is None:
+            out = np.empty((n, emb.shape[1]), dtype=np.float32)
+        out[idx] = emb
+    return out
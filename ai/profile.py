@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Sequence
 import numpy as np
 
 @dataclass
@@ -30,4 +30,45 @@ class UserProfileBuilder:
         if norm > 0:
             user_vec = user_vec / norm
 
-        return user_vec
\ No newline at end of file
+        return user_vec
+
+    def _segment_means(self, emb: np.ndarray, counts: np.ndarray, dim: int) -> np.ndarray:
+        out = np.zeros((counts.shape[0], dim), dtype=np.float32)
+        nonempty = counts > 0
+        if emb.size == 0 or not nonempty.any():
+            return out
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # reduceat некорректен для пустых сегментов, поэтому считаем только по непустым
+        sums = np.add.reduceat(emb, starts[nonempty], axis=0)
+        out[nonempty] = sums / counts[nonempty, None]
+        return out
+
+    def build_many(
+        self,
+        liked_embeddings: np.ndarray,
+        liked_counts: Sequence[int],
+        disliked_embeddings: Optional[np.ndarray] = None,
+        disliked_counts: Optional[Sequence[int]] = None,
+    ) -> np.ndarray:
+        """Векторизованный build для U пользователей сразу.
+
+        Эмбеддинги всех пользователей склеены подряд, *_counts — сколько строк у каждого.
+        Пользователи с лайками меньше min_likes получают нулевой вектор.
+        """
+        liked_counts_arr = np.asarray(liked_counts, dtype=np.int64)
+        dim = int(liked_embeddings.shape[-1])
+        user_vecs = self._segment_means(liked_embeddings, liked_counts_arr, dim)
+
+        if (self.config.use_dislikes
+            and disliked_embeddings is not None
+            and disliked_embeddings.size > 0
+            and disliked_counts is not None):
+            user_vecs -= self._segment_means(
+                disliked_embeddings, np.asarray(disliked_counts, dtype=np.int64), dim
+            )
+
+        user_vecs[liked_counts_arr < max(self.config.min_likes, 1)] = 0.0
+
+        norms = np.linalg.norm(user_vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return user_vecs / norms
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+
+STORE_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """float32 (N, D) -> (данные нужного dtype, per-vector scale для int8 либо None)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+        return q, scales.astype(np.float32)
+    raise ValueError(f"Unknown store dtype {dtype!r}, expected one of {STORE_DTYPES}")
+
+
+def dequantize(data: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    out = data.astype(np.float32)
+    if scales is not None:
+        out *= scales[:, None]
+    return out
+
+
+def score(data: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray, chunk: int = 65_536) -> np.ndarray:
+    """data @ query без материализации всей float32-матрицы: блоками через BLAS."""
+    query = np.asarray(query, dtype=np.float32)
+    out = np.empty((data.shape[0],) + query.shape[1:], dtype=np.float32)
+    for start in range(0, data.shape[0], chunk):
+        block = data[start : start + chunk]
+        if block.dtype != np.float32:
+            block = block.astype(np.float32)
+        res = block @ query
+        if scales is not None:
+            s = scales[start : start + chunk]
+            res *= s if res.ndim == 1 else s[:, None]
+        out[start : start + chunk] = res
+    return out
+
+
+def recall_at_k(vectors: np.ndarray, queries: np.ndarray, k: int, dtype: str) -> float:
+    """Доля точного float32 top-k, которую находит скоринг по квантованной матрице."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    data, scales = quantize(vectors, dtype)
+
+    exact = vectors @ queries.T                    # (N, Q)
+    approx = score(data, scales, queries.T)        # (N, Q)
+
+    k = min(k, vectors.shape[0])
+    hits = 0
+    for j in range(queries.shape[0]):
+        ref = np.argpartition(-exact[:, j], k - 1)[:k]
+        got = np.argpartition(-approx[:, j], k - 1)[:k]
+        hits += len(np.intersect1d(ref, got))
+    return hits / (k * queries.shape[0])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall@k квантованного стора против float32")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # кластеризованные нормированные векторы, ближе к реальным эмбеддингам, чем чистый шум
+    centers = rng.standard_normal((max(args.n // 500, 1), args.dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, centers.shape[0], args.n)]
+    vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.n, size=args.queries, replace=False)]
+
+    report = {}
+    for dtype in STORE_DTYPES:
+        data, scales = quantize(vectors, dtype)
+        nbytes = data.nbytes + (0 if scales is None else scales.nbytes)
+        report[dtype] = {
+            "recall_at_k": recall_at_k(vectors, queries, args.k, dtype),
+            "bytes": int(nbytes),
+            "compression": vectors.nbytes / nbytes,
+        }
+    print(json.dumps(report, indent=2))
+
+    failed = [d for d, r in report.items() if r["recall_at_k"] < args.min_recall]
+    if failed:
+        raise SystemExit(f"recall@{args.k} below {args.min_recall} for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,12 @@ from dataclasses import dataclass
 from typing import Optional, Sequence, Tuple, List
 
 import numpy as np
-from sentence_transformers import util
 
 from .preprocess import TextPreprocessor
 from .embeddings import EmbeddingModel
 from .profile import UserProfileBuilder
+from .scoring import ScoringEngine
+from .metrics import TEXT_LENGTH_CHARS, stage
 from shared.logging import get_logger
 
 logger = get_logger(__name__)
@@ -24,11 +25,13 @@ class NewsRecommender:
         preprocessor: Optional[TextPreprocessor] = None,
         profile_builder: Optional[UserProfileBuilder] = None,
         config: Optional[RecommenderConfig] = None,
+        scoring_engine: Optional[ScoringEngine] = None,
     ) -> None:
         self.embedding_model = embedding_model or EmbeddingModel()
         self.preprocessor = preprocessor or TextPreprocessor()
         self.profile_builder = profile_builder or UserProfileBuilder()
         self.config = config or RecommenderConfig()
+        self.scoring_engine = scoring_engine or ScoringEngine()
 
         logger.info(
             "NewsRecommender initialized",
@@ -40,8 +43,14 @@ class NewsRecommender:
             "Cleaning and encoding texts",
             extra={"texts_count": len(texts)},
         )
-        cleaned = self.preprocessor.clean_texts(texts)
-        return self.embedding_model.encode(cleaned)
+        with stage("preprocess"):
+            cleaned = self.preprocessor.clean_texts(texts)
+        TEXT_LENGTH_CHARS.observe_many(len(t) for t in cleaned)
+        with stage("encode"):
+            return self.embedding_model.encode(cleaned)
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        return self._clean_and_encode(texts)
 
     def build_user_vector_from_texts(
         self,
@@ -68,8 +77,20 @@ class NewsRecommender:
                 disliked_emb = self._clean_and_encode(disliked_texts)
             else:
                 disliked_emb = None
+        except Exception:
+            logger.exception("Failed to build user vector")
+            raise
 
-            user_vec = self.profile_builder.build(liked_emb, disliked_emb)
+        return self.build_user_vector_from_embeddings(liked_emb, disliked_emb)
+
+    def build_user_vector_from_embeddings(
+        self,
+        liked_emb: np.ndarray,
+        disliked_emb: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        try:
+            with stage("profile"):
+                user_vec = self.profile_builder.build(liked_emb, disliked_emb)
         except Exception:
             logger.exception("Failed to build user vector")
             raise
@@ -109,17 +130,76 @@ class NewsRecommender:
         )
 
         cand_emb = self._clean_and_encode(candidate_texts)
+        return self.rank_embeddings(user_vector, cand_emb, top_k)
 
-        user_vec_2d = user_vector.reshape(1, -1)
-        cos_sim_matrix = util.cos_sim(user_vec_2d, cand_emb)  # (1, N)
-        scores = cos_sim_matrix[0].cpu().numpy()              # (N,)
+    def rank_embeddings(
+        self,
+        user_vector: np.ndarray,
+        candidate_embeddings: np.ndarray,
+        top_k: Optional[int] = None,
+        exclude_indices: Optional[Sequence[int]] = None,
+    ) -> Tuple[List[int], np.ndarray]:
+        """(индексы top_k кандидатов, их скоры) — только выбранные элементы."""
+        if user_vector.size == 0 or candidate_embeddings.shape[0] == 0:
+            return [], np.array([])
 
-        sorted_indices = np.argsort(scores)[::-1]
-        top_indices = sorted_indices[:top_k].tolist()
+        top_k = top_k or self.config.top_k
+
+        with stage("rank"):
+            idx, scores = self.scoring_engine.top_k(
+                user_vector,
+                candidate_embeddings,
+                top_k,
+                exclude=None if exclude_indices is None else [exclude_indices],
+                normalize=not self.embedding_model.config.normalize,
+            )
+        keep = idx[0] >= 0
+        top_indices = idx[0][keep].tolist()
 
         logger.debug(
             "Candidates ranked",
             extra={"top_indices": top_indices},
         )
 
-        return top_indices, scores
+        return top_indices, scores[0][keep]
+
+    def build_user_vectors_from_texts(
+        self,
+        liked_texts: Sequence[Sequence[str]],
+        disliked_texts: Sequence[Sequence[str]],
+    ) -> np.ndarray:
+        """(U, D) матрица профилей: тексты всех пользователей кодируются одним вызовом."""
+        liked_counts = [len(x) for x in liked_texts]
+        disliked_counts = [len(x) for x in disliked_texts]
+        flat_liked = [t for texts in liked_texts for t in texts]
+        flat_disliked = [t for texts in disliked_texts for t in texts]
+
+        if not flat_liked:
+            return np.zeros((len(liked_texts), 0), dtype=np.float32)
+
+        emb = self._clean_and_encode(flat_liked + flat_disliked)
+        liked_emb, disliked_emb = emb[: len(flat_liked)], emb[len(flat_liked) :]
+
+        with stage("profile"):
+            return self.profile_builder.build_many(
+                liked_emb, liked_counts, disliked_emb, disliked_counts
+            )
+
+    def rank_embeddings_batch(
+        self,
+        user_vectors: np.ndarray,
+        candidate_embeddings: np.ndarray,
+        top_k: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k для U пользователей одним (U x D) @ (D x N). Возвращает (индексы, скоры) формы (U, k)."""
+        if user_vectors.size == 0 or candidate_embeddings.shape[0] == 0:
+            empty = np.zeros((user_vectors.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        with stage("rank"):
+            return self.scoring_engine.top_k(
+                user_vectors,
+                candidate_embeddings,
+                top_k or self.config.top_k,
+                normalize=not self.embedding_model.config.normalize,
+            )
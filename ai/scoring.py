@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class ScoringConfig:
+    # кандидаты обрабатываются блоками, чтобы (U x chunk) матрица скоров помещалась в кэш/память
+    chunk_size: int = 131_072
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _topk_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k по каждой строке за O(N) (argpartition), затем сортировка только k элементов."""
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+class ScoringEngine:
+    """Косинусный скоринг + top-k на numpy, без torch.
+
+    Пользователи (U, D) и кандидаты (N, D) должны быть нормированы (или передайте
+    normalize=True). Результат — только выбранные элементы: индексы и скоры формы (U, k),
+    отсортированные по убыванию скора. Исключённые кандидаты получают -inf внутри
+    ядра и в выдачу не попадают; если кандидатов меньше k, строка дополняется
+    индексом -1 и скором -inf.
+    """
+
+    def __init__(self, config: Optional[ScoringConfig] = None) -> None:
+        self.config = config or ScoringConfig()
+
+    def top_k(
+        self,
+        user_vectors: np.ndarray,
+        candidates: np.ndarray,
+        k: int,
+        exclude: Optional[Sequence[Sequence[int]]] = None,
+        normalize: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        users = np.asarray(user_vectors, dtype=np.float32)
+        if users.ndim == 1:
+            users = users.reshape(1, -1)
+        cand = np.asarray(candidates, dtype=np.float32)
+        n = cand.shape[0]
+        n_users = users.shape[0]
+
+        if n == 0 or k <= 0 or users.size == 0:
+            return np.full((n_users, 0), -1, dtype=np.int64), np.zeros((n_users, 0), dtype=np.float32)
+
+        if normalize:
+            users = _normalize_rows(users)
+            cand = _normalize_rows(cand)
+
+        k = min(k, n)
+
+        # exclude: для каждого пользователя — индексы кандидатов, которые нельзя рекомендовать
+        excl_rows = excl_cols = None
+        if exclude is not None:
+            pairs = [(u, int(c)) for u, cols in enumerate(exclude) for c in cols if 0 <= int(c) < n]
+            if pairs:
+                excl_rows, excl_cols = (np.asarray(x, dtype=np.int64) for x in zip(*pairs))
+
+        best_idx: Optional[np.ndarray] = None
+        best_scores: Optional[np.ndarray] = None
+        step = self.config.chunk_size
+        for start in range(0, n, step):
+            block = users @ cand[start : start + step].T          # (U, chunk)
+            if excl_rows is not None:
+                in_block = (excl_cols >= start) & (excl_cols < start + block.shape[1])
+                block[excl_rows[in_block], excl_cols[in_block] - start] = -np.inf
+
+            idx, sc = _topk_rows(block, min(k, block.shape[1]))
+            idx = idx + start
+            if best_idx is None:
+                best_idx, best_scores = idx, sc
+            else:
+                # слияние текущего top-k с top-k блока: 2k элементов на строку
+                merged_idx = np.concatenate([best_idx, idx], axis=1)
+                merged_sc = np.concatenate([best_scores, sc], axis=1)
+                sel, best_scores = _topk_rows(merged_sc, k)
+                best_idx = np.take_along_axis(merged_idx, sel, axis=1)
+
+        best_idx = np.where(np.isneginf(best_scores), -1, best_idx)
+        return best_idx.astype(np.int64), best_scores.astype(np.float32)
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.logging import get_logger
+
+from .quantization import STORE_DTYPES, dequantize, quantize, score
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ArticleStoreConfig:
+    store_dir: Optional[str] = field(default_factory=lambda: os.getenv("ARTICLE_STORE_DIR") or None)
+    initial_capacity: int = 1024
+    # float32 | float16 | int8 (int8 — с отдельным scale на каждый вектор)
+    dtype: str = os.getenv("ARTICLE_STORE_DTYPE", "float32")
+
+
+class ArticleVectorStore:
+    """Эмбеддинги статей по article_id, лежат одной непрерывной матрицей (N, D).
+
+    Матрица хранится в config.dtype; наружу векторы всегда отдаются как float32,
+    а скоринг идёт прямо по компактной матрице (см. quantization.score).
+    """
+
+    def __init__(self, config: Optional[ArticleStoreConfig] = None) -> None:
+        self.config = config or ArticleStoreConfig()
+        if self.config.dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown store dtype {self.config.dtype!r}, expected one of {STORE_DTYPES}")
+        self._lock = threading.RLock()
+        self._row_by_id: Dict[int, int] = {}
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._size = 0
+
+        if self.config.store_dir:
+            self.load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, article_id: int) -> bool:
+        return int(article_id) in self._row_by_id
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else int(self._matrix.shape[1])
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        if self._matrix is None:
+            return 0
+        n = self._matrix[: self._size].nbytes
+        return n + (0 if self._scales is None else self._scales[: self._size].nbytes)
+
+    def _reserve(self, n: int, dim: int) -> None:
+        int8 = self.config.dtype == "int8"
+        if self._matrix is None:
+            cap = max(self.config.initial_capacity, n)
+            self._matrix = np.zeros((cap, dim), dtype=np.dtype(self.config.dtype))
+            self._ids = np.zeros(cap, dtype=np.int64)
+            self._scales = np.ones(cap, dtype=np.float32) if int8 else None
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dim mismatch: store has {self._matrix.shape[1]}, got {dim}")
+        cap = self._matrix.shape[0]
+        if n <= cap:
+            return
+        while cap < n:
+            cap *= 2
+        matrix = np.zeros((cap, dim), dtype=self._matrix.dtype)
+        matrix[: self._size] = self._matrix[: self._size]
+        ids = np.zeros(cap, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        if int8:
+            scales = np.ones(cap, dtype=np.float32)
+            scales[: self._size] = self._scales[: self._size]
+            self._scales = scales
+        self._matrix, self._ids = matrix, ids
+
+    def upsert(self, ids: Sequence[int], vectors: np.ndarray, journal: bool = False) -> List[int]:
+        """Добавляет/обновляет векторы. Возвращает номера строк в матрице.
+
+        journal=True — батч дописывается в журнал на диске: он переживает падение
+        процесса до следующего снимка (save).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError("vectors must be a 2-D array with one row per id")
+        data, scales = quantize(vectors, self.config.dtype)
+
+        with self._lock:
+            new_ids = [int(i) for i in ids if int(i) not in self._row_by_id]
+            self._reserve(self._size + len(set(new_ids)), vectors.shape[1])
+            rows: List[int] = []
+            for i, article_id in enumerate(ids):
+                article_id = int(article_id)
+                row = self._row_by_id.get(article_id)
+                if row is None:
+                    row = self._size
+                    self._row_by_id[article_id] = row
+                    self._ids[row] = article_id
+                    self._size += 1
+                rows.append(row)
+            rows_arr = np.asarray(rows, dtype=np.int64)
+            self._matrix[rows_arr] = data
+            if scales is not None:
+                self._scales[rows_arr] = scales
+            if journal and self.config.store_dir:
+                self._append_journal(ids, vectors)
+        return rows
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        """float32 векторы по номерам строк."""
+        if self._matrix is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        rows = np.asarray(rows, dtype=np.int64)
+        scales = None if self._scales is None else self._scales[rows]
+        return dequantize(self._matrix[rows], scales)
+
+    def iter_blocks(self, chunk: int = 65_536) -> Iterator[Tuple[int, np.ndarray]]:
+        """(start, float32 блок) по всей матрице — без материализации всей float32-копии."""
+        for start in range(0, self._size, chunk):
+            stop = min(start + chunk, self._size)
+            yield start, self.get(np.arange(start, stop))
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Скалярные произведения query со строками (все строки, если rows=None)."""
+        if self._matrix is None:
+            return np.zeros(0, dtype=np.float32)
+        if rows is None:
+            data = self._matrix[: self._size]
+            scales = None if self._scales is None else self._scales[: self._size]
+        else:
+            data = self._matrix[rows]
+            scales = None if self._scales is None else self._scales[rows]
+        return score(data, scales, query)
+
+    def lookup(self, ids: Sequence[int]) -> Tuple[List[int], np.ndarray, List[int]]:
+        """(найденные id, их векторы, отсутствующие id) — порядок найденных сохраняется."""
+        with self._lock:
+            found: List[int] = []
+            rows: List[int] = []
+            missing: List[int] = []
+            for article_id in ids:
+                row = self._row_by_id.get(int(article_id))
+                if row is None:
+                    missing.append(int(article_id))
+                else:
+                    found.append(int(article_id))
+                    rows.append(row)
+            return found, self.get(np.asarray(rows, dtype=np.int64)), missing
+
+    # ----------------- persistence -----------------
+
+    # Между снимками каждый батч upsert(journal=True) дописывается в article_journal.npy
+    # (пары np.save: ids, float32-векторы) с fsync — O(батча), а не O(N). save() под локом
+    # переносит журнал в article_journal.npy.old и удаляет его, когда снимок записан;
+    # load() после снимка переигрывает .old и текущий журнал.
+
+    def _journal_paths(self) -> Tuple[str, str]:
+        path = os.path.join(self.config.store_dir or ".", "article_journal.npy")
+        return path, path + ".old"
+
+    def _append_journal(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        os.makedirs(self.config.store_dir, exist_ok=True)
+        with open(self._journal_paths()[0], "ab") as f:
+            np.save(f, np.asarray(ids, dtype=np.int64))
+            np.save(f, vectors)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate_journal(self) -> None:
+        journal, old = self._journal_paths()
+        if not os.path.exists(journal):
+            return
+        if not os.path.exists(old):
+            os.replace(journal, old)
+            return
+        # прошлый снимок не дописался — .old ещё нужен, доклеиваем к нему
+        with open(journal, "rb") as src, open(old, "ab") as dst:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(journal)
+
+    def _replay_journal(self) -> int:
+        replayed = 0
+        for path in reversed(self._journal_paths()):
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                while True:
+                    try:
+                        ids = np.load(f)
+                        vectors = np.load(f)
+                    except (EOFError, ValueError, OSError):
+                        # конец файла или оборванная падением последняя запись
+                        break
+                    self.upsert(ids.tolist(), vectors)
+                    replayed += len(ids)
+        return replayed
+
+    def _paths(self) -> Tuple[str, str, str]:
+        base = self.config.store_dir or "."
+        return (
+            os.path.join(base, "article_ids.npy"),
+            os.path.join(base, "article_vectors.npy"),
+            os.path.join(base, "article_scales.npy"),
+        )
+
+    def save(self) -> int:
+        """Атомарно пишет снимок на диск; возвращает число сохранённых строк."""
+        if not self.config.store_dir or self._matrix is None:
+            return 0
+        os.makedirs(self.config.store_dir, exist_ok=True)
+        ids_path, vec_path, scales_path = self._paths()
+        with self._lock:
+            ids = self.ids.copy()
+            matrix = self._matrix[: self._size].copy()
+            scales = None if self._scales is None else self._scales[: self._size].copy()
+            # всё, что попало в копию, больше не нужно в журнале; новые батчи пойдут в свежий
+            self._rotate_journal()
+        arrays = [(vec_path, matrix), (ids_path, ids)]
+        if scales is not None:
+            arrays.insert(0, (scales_path, scales))
+        elif os.path.exists(scales_path):
+            os.remove(scales_path)
+        # сначала во временный файл, потом атомарный rename — чтобы не оставить полузаписанный стор
+        for path, arr in arrays:
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+        old_journal = self._journal_paths()[1]
+        if os.path.exists(old_journal):
+            os.remove(old_journal)
+        logger.info("Article vector store saved", extra={"size": len(ids), "store_dir": self.config.store_dir})
+        return len(ids)
+
+    def load(self) -> None:
+        with self._lock:
+            self._load_snapshot()
+            replayed = self._replay_journal()
+        if replayed:
+            logger.info("Article vector journal replayed", extra={"rows": replayed, "store_dir": self.config.store_dir})
+
+    def _load_snapshot(self) -> None:
+        ids_path, vec_path, scales_path = self._paths()
+        if not (os.path.exists(ids_path) and os.path.exists(vec_path)):
+            return
+        try:
+            ids = np.load(ids_path)
+            matrix = np.load(vec_path)
+            scales = np.load(scales_path) if matrix.dtype == np.int8 else None
+        except Exception:
+            logger.exception("Failed to load article vector store", extra={"store_dir": self.config.store_dir})
+            return
+        if len(ids) != len(matrix) or len(ids) == 0:
+            return
+        self._row_by_id.clear()
+        self._matrix = None
+        self._scales = None
+        self._size = 0
+        # через upsert: если сменился ARTICLE_STORE_DTYPE, матрица перекодируется
+        for start in range(0, len(ids), 65_536):
+            stop = start + 65_536
+            block_scales = None if scales is None else scales[start:stop]
+            self.upsert(ids[start:stop].tolist(), dequantize(matrix[start:stop], block_scales))
+        logger.info(
+            "Article vector store loaded",
+            extra={"size": len(ids), "store_dir": self.config.store_dir, "dtype": self.config.dtype},
+        )
@@ -1,4 +1,4 @@
-from model_core import recommend
+from ai.model_core import recommend
 
 
 def main():
@@ -22,7 +22,7 @@ def main():
 
     print("=== Recommendation Results ===")
     for item in result.items:
-        print(f"- {item.title}  (score={item.score:.4f})")
+        print(f"- {candidate_news[item.index]}  (score={item.score:.4f})")
 
 
 if __name__ == "__main__":
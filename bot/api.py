@@ -14,6 +14,12 @@ class Article:
     published_at: Optional[str]
 
 
+@dataclass
+class ArticlesPage:
+    items: list[Article]
+    next_cursor: Optional[str] = None
+
+
 class GatewayClient:
     def __init__(self, base_url: str) -> None:
         self.base_url = base_url.rstrip("/")
@@ -24,12 +30,23 @@ class GatewayClient:
             r.raise_for_status()
             return int(r.json()["user_id"])
 
-    async def latest_articles(self, limit: int = 10, offset: int = 0) -> list[Article]:
+    async def latest_articles(self, limit: int = 10, cursor: Optional[str] = None) -> ArticlesPage:
+        """Страница свежих новостей; next_cursor из ответа — за следующей (None — дальше пусто)."""
+        params: dict = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        async with httpx.AsyncClient(timeout=20.0) as client:
+            r = await client.get(f"{self.base_url}/articles/latest", params=params)
+            r.raise_for_status()
+            data = r.json()
+            return ArticlesPage(items=[Article(**x) for x in data["items"]], next_cursor=data.get("next_cursor"))
+
+    async def article(self, article_id: int) -> Article:
+        """Статья целиком, с content: списки отдают её без тела."""
         async with httpx.AsyncClient(timeout=20.0) as client:
-            r = await client.get(f"{self.base_url}/articles/latest", params={"limit": limit, "offset": offset})
+            r = await client.get(f"{self.base_url}/articles/{article_id}")
             r.raise_for_status()
-            data = r.json()["items"]
-            return [Article(**x) for x in data]
+            return Article(**r.json())
 
     async def event(self, external_id: str, article_id: int, event_type: str) -> None:
         async with httpx.AsyncClient(timeout=20.0) as client:
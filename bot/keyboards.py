@@ -11,3 +11,10 @@ def article_kb(article_id: int) -> InlineKeyboardMarkup:
             InlineKeyboardButton(text="🔁 Recommend", callback_data="recommend:0"),
         ],
     ])
+
+
+def more_news_kb(cursor: str) -> InlineKeyboardMarkup:
+    # курсор gateway — 32 символа, в лимит callback_data (64 байта) помещается
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="➡️ Ещё новости", callback_data=f"news:{cursor}")],
+    ])
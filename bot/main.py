@@ -9,9 +9,10 @@ from aiogram.filters import Command
 
 from bot.config import BOT_TOKEN, API_URL
 from bot.api import GatewayClient
-from bot.keyboards import article_kb
+from bot.keyboards import article_kb, more_news_kb
 
 client = GatewayClient(API_URL)
+NEWS_PAGE_SIZE = 5
 
 
 def user_external_id_from_message(m: Message) -> str:
@@ -43,18 +44,29 @@ async def cmd_help(m: Message):
     )
 
 
+async def send_news_page(m: Message, cursor: str | None = None) -> None:
+    page = await client.latest_articles(limit=NEWS_PAGE_SIZE, cursor=cursor)
+    if not page.items:
+        await m.answer("Больше новостей нет." if cursor else "Пока нет новостей. Попробуй позже.")
+        return
+
+    for a in page.items:
+        text = f"📰 <b>{a.title}</b>\n{a.url}\n\nИсточник: {a.source}"
+        await m.answer(text, reply_markup=article_kb(a.id))
+    if page.next_cursor:
+        await m.answer("Показать ещё?", reply_markup=more_news_kb(page.next_cursor))
+
+
 async def cmd_news(m: Message):
     ext = user_external_id_from_message(m)
     await client.ensure_user(ext)
+    await send_news_page(m)
 
-    arts = await client.latest_articles(limit=5, offset=0)
-    if not arts:
-        await m.answer("Пока нет новостей. Попробуй позже.")
-        return
 
-    for a in arts:
-        text = f"📰 <b>{a.title}</b>\n{a.url}\n\nИсточник: {a.source}"
-        await m.answer(text, reply_markup=article_kb(a.id))
+async def on_more_news(cb: CallbackQuery):
+    cursor = (cb.data or "").split(":", 1)[1]
+    await send_news_page(cb.message, cursor)
+    await cb.answer()
 
 
 async def cmd_recommend(m: Message):
@@ -124,6 +136,7 @@ async def main():
     dp.callback_query.register(on_article_vote, F.data.startswith("like:"))
     dp.callback_query.register(on_article_vote, F.data.startswith("dislike:"))
     dp.callback_query.register(on_recommend_button, F.data.startswith("recommend:"))
+    dp.callback_query.register(on_more_news, F.data.startswith("news:"))
 
     await dp.start_polling(bot)
 
@@ -1,12 +1,11 @@
 from __future__ import annotations
-from typing import Generator
+from typing import AsyncGenerator
 
-from infr.postgres.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from infr.postgres.db import get_async_sessionmaker
 
-def get_db() -> Generator:
-    db = SessionLocal()
-    try:
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as db:
         yield db
-    finally:
-        db.close()
@@ -1,15 +1,21 @@
 from __future__ import annotations
+import asyncio
+import hashlib
+import os
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
 
 import feedparser
-import httpx
 
 from shared.logging import get_logger
+from gateway.http_clients import clients
 
 logger = get_logger(__name__)
 
+# ленты больше этого размера парсятся в потоке, чтобы не держать event loop
+RSS_PARSE_INLINE_MAX_BYTES = int(os.getenv("RSS_PARSE_INLINE_MAX_BYTES", "65536"))
+
 
 @dataclass
 class FetchedItem:
@@ -18,6 +24,29 @@ class FetchedItem:
     source: str
     published_at: Optional[datetime]
     content: Optional[str]
+    # отпечаток записи ленты: если не изменился, статью не нужно ни скрейпить, ни переписывать
+    feed_hash: Optional[str] = None
+
+
+def fingerprint(*parts: object) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(b"" if p is None else str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+@dataclass
+class FeedResult:
+    items: list[FetchedItem]
+    status: int
+    # валидаторы для следующего условного GET
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
 
 
 def _parse_dt(entry) -> Optional[datetime]:
@@ -32,10 +61,7 @@ def _parse_dt(entry) -> Optional[datetime]:
     return None
 
 
-async def fetch_rss_items(rss_url: str, source_name: str, limit: int = 20) -> list[FetchedItem]:
-    logger.info("Fetching RSS", extra={"rss": rss_url, "source": source_name})
-    d = feedparser.parse(rss_url)
-
+def _entries_to_items(d, source_name: str, limit: int) -> list[FetchedItem]:
     items: list[FetchedItem] = []
     for e in d.entries[:limit]:
         link = getattr(e, "link", None)
@@ -55,19 +81,58 @@ async def fetch_rss_items(rss_url: str, source_name: str, limit: int = 20) -> li
                 source=source_name,
                 published_at=published_at,
                 content=str(summary) if summary else None,
+                feed_hash=fingerprint(title, summary, published_at.isoformat() if published_at else None),
             )
         )
 
     return items
 
 
-async def enrich_with_scrapper(scrapper_url: str, url: str) -> str | None:
-    # дергаем твой scrapper: POST /scrape {url}
+async def fetch_rss_items(
+    rss_url: str,
+    source_name: str,
+    limit: int = 20,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> FeedResult:
+    """Скачивает ленту через общий async-клиент; с etag/last_modified — условным GET.
+
+    На 304 лента не парсится вовсе, items пустой, а валидаторы остаются прежними.
+    """
+    logger.info("Fetching RSS", extra={"rss": rss_url, "source": source_name})
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    r = await clients.feeds.get(rss_url, headers=headers, follow_redirects=True)
+    if r.status_code == 304:
+        logger.info("RSS not modified", extra={"rss": rss_url, "source": source_name})
+        return FeedResult(items=[], status=304, etag=etag, last_modified=last_modified)
+    r.raise_for_status()
+
+    body = r.content
+    response_headers = {k.lower(): v for k, v in r.headers.items()}
+    if len(body) > RSS_PARSE_INLINE_MAX_BYTES:
+        d = await asyncio.to_thread(feedparser.parse, body, response_headers=response_headers)
+    else:
+        d = feedparser.parse(body, response_headers=response_headers)
+
+    return FeedResult(
+        items=_entries_to_items(d, source_name, limit),
+        status=r.status_code,
+        etag=r.headers.get("ETag") or None,
+        last_modified=r.headers.get("Last-Modified") or None,
+    )
+
+
+async def enrich_with_scrapper(url: str) -> str | None:
+    # дергаем твой scrapper: POST /scrape {url}; только чтение, повторять безопасно
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            r = await client.post(f"{scrapper_url}/scrape", json={"url": url})
-            r.raise_for_status()
-            data = r.json()
+        r = await clients.scrapper.post("/scrape", json={"url": url}, idempotent=True)
+        r.raise_for_status()
+        data = r.json()
         # берём description, если есть
         desc = data.get("description") or data.get("h1") or data.get("title")
         if desc:
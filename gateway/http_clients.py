@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+import numpy as np
+
+from shared.logging import get_logger
+
+logger = get_logger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# 503 — осознанный отказ upstream'а по перегрузке (Retry-After), не признак поломки
+_FAILURE_STATUSES = frozenset({500, 502, 504})
+
+
+@dataclass
+class UpstreamConfig:
+    name: str
+    base_url: str
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry_s: float = 30.0
+    connect_timeout_s: float = 5.0
+    read_timeout_s: float = 60.0
+    # повторы только для идемпотентных вызовов: экспоненциальный backoff с full jitter
+    retries: int = 2
+    backoff_base_s: float = 0.1
+    backoff_max_s: float = 2.0
+    # N подряд неудач -> breaker открыт reset_s секунд, потом один пробный запрос; 0 — без breaker'а
+    breaker_failures: int = 5
+    breaker_reset_s: float = 30.0
+
+    @classmethod
+    def from_env(cls, name: str, base_url: str, **defaults: Any) -> "UpstreamConfig":
+        """AI_HTTP_MAX_CONNECTIONS, SCRAPPER_HTTP_READ_TIMEOUT_S и т.п. переопределяют дефолты."""
+        cfg = cls(name=name, base_url=base_url, **defaults)
+        prefix = name.upper()
+        for field_name, value in vars(cfg).items():
+            if field_name in ("name", "base_url"):
+                continue
+            raw = os.getenv(f"{prefix}_HTTP_{field_name.upper()}")
+            if raw is not None:
+                setattr(cfg, field_name, type(value)(raw))
+        return cfg
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """Upstream помечен нездоровым, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int, reset_s: float) -> None:
+        self.failures_threshold = failures
+        self.reset_s = reset_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_s:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        if self.failures_threshold <= 0:
+            return True
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.failures_threshold <= 0:
+            return
+        if self.opened_at is not None or self.failures >= self.failures_threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            # из half_open неудачная проба снова открывает breaker на reset_s
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """Вызывающий отменил запрос: об upstream это ничего не говорит, но проба
+        half_open засчитывается неудачной — иначе флаг пробы не снимется никогда."""
+        if self._probe_in_flight:
+            self.record_failure()
+
+
+class Upstream:
+    """Один keep-alive пул httpx на upstream + повторы, breaker и метрики."""
+
+    def __init__(self, config: UpstreamConfig) -> None:
+        self.config = config
+        self.client = httpx.AsyncClient(
+            base_url=config.base_url,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive,
+                keepalive_expiry=config.keepalive_expiry_s,
+            ),
+            timeout=httpx.Timeout(config.read_timeout_s, connect=config.connect_timeout_s),
+        )
+        self.breaker = CircuitBreaker(config.breaker_failures, config.breaker_reset_s)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self._latencies_ms: Deque[float] = deque(maxlen=2048)
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.config.backoff_max_s, self.config.backoff_base_s * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def request(self, method: str, url: str, *, idempotent: Optional[bool] = None, **kwargs: Any) -> httpx.Response:
+        """Как httpx.AsyncClient.request; idempotent=True разрешает повторы и для POST."""
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.config.retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit for upstream {self.config.name!r} is open")
+
+            last = attempt == attempts - 1
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            t0 = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                self.errors += 1
+                self.breaker.record_failure()
+                if last:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except BaseException:
+                # любая другая ошибка — тоже неудача, в том числе для пробы half_open
+                self.errors += 1
+                self.breaker.record_failure()
+                raise
+            finally:
+                self.in_flight -= 1
+                self._latencies_ms.append((time.perf_counter() - t0) * 1000.0)
+
+            if response.status_code in _FAILURE_STATUSES:
+                self.errors += 1
+                self.breaker.record_failure()
+                if not last:
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+            else:
+                self.breaker.record_success()
+            return response
+
+        raise AssertionError("unreachable")
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = np.asarray(self._latencies_ms) if self._latencies_ms else None
+        return {
+            "base_url": self.config.base_url,
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected_by_breaker": self.rejected,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "max_connections": self.config.max_connections,
+            "pool_utilization": self.in_flight / self.config.max_connections if self.config.max_connections else 0.0,
+            "latency_ms_p50": float(np.percentile(lat, 50)) if lat is not None else None,
+            "latency_ms_p99": float(np.percentile(lat, 99)) if lat is not None else None,
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class HttpClients:
+    """Клиенты gateway ко всем upstream'ам: создаются на старте, закрываются на остановке."""
+
+    def __init__(self) -> None:
+        self._upstreams: Dict[str, Upstream] = {}
+
+    def _configs(self) -> Dict[str, UpstreamConfig]:
+        return {
+            "ai": UpstreamConfig.from_env("ai", os.getenv("AI_URL", "http://ai:8002"), read_timeout_s=60.0),
+            "scrapper": UpstreamConfig.from_env(
+                "scrapper",
+                os.getenv("SCRAPPER_URL", "http://scrapper:8003"),
+                read_timeout_s=20.0,
+                retries=1,
+            ),
+            # внешние RSS-ленты: много разных сайтов за одним пулом, поэтому общий breaker не нужен
+            "feeds": UpstreamConfig.from_env(
+                "feeds",
+                "",
+                read_timeout_s=30.0,
+                retries=1,
+                breaker_failures=0,
+            ),
+        }
+
+    def start(self) -> None:
+        if self._upstreams:
+            return
+        for name, cfg in self._configs().items():
+            self._upstreams[name] = Upstream(cfg)
+        logger.info(
+            "HTTP clients started",
+            extra={"upstreams": {n: u.config.max_connections for n, u in self._upstreams.items()}},
+        )
+
+    def _get(self, name: str) -> Upstream:
+        if not self._upstreams:
+            # вызов до startup (скрипты, тесты) — создаём лениво
+            self.start()
+        return self._upstreams[name]
+
+    @property
+    def ai(self) -> Upstream:
+        return self._get("ai")
+
+    @property
+    def scrapper(self) -> Upstream:
+        return self._get("scrapper")
+
+    @property
+    def feeds(self) -> Upstream:
+        return self._get("feeds")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: u.snapshot() for name, u in self._upstreams.items()}
+
+    async def aclose(self) -> None:
+        upstreams, self._upstreams = self._upstreams, {}
+        for u in upstreams.values():
+            await u.aclose()
+
+
+clients = HttpClients()
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.logging import get_logger
+from gateway.fetcher import FetchedItem, fetch_rss_items, enrich_with_scrapper, fingerprint
+from infr.postgres.repositories.aio import (
+    upsert_articles,
+    get_article_feed_hashes,
+    list_articles_without_embeddings,
+    get_feed_states,
+    save_feed_states,
+)
+
+logger = get_logger(__name__)
+
+# маркер конца потока между стадиями
+_DONE = object()
+
+
+@dataclass
+class IngestConfig:
+    fetch_concurrency: int = int(os.getenv("INGEST_FETCH_CONCURRENCY", "4"))
+    scrape_concurrency: int = int(os.getenv("INGEST_SCRAPE_CONCURRENCY", "8"))
+    # не больше N одновременных scrape на один сайт, чтобы не долбить его и не ловить бан
+    per_domain_concurrency: int = int(os.getenv("INGEST_PER_DOMAIN_CONCURRENCY", "2"))
+    write_batch_size: int = int(os.getenv("INGEST_WRITE_BATCH_SIZE", "50"))
+    # неполный батч пишется, если новых элементов не было столько секунд
+    write_flush_s: float = float(os.getenv("INGEST_WRITE_FLUSH_S", "2.0"))
+    items_per_source: int = int(os.getenv("INGEST_ITEMS_PER_SOURCE", "20"))
+    # в конце прогона досчитываем эмбеддинги статей, у которых их нет (упавший on_batch), не больше N
+    reembed_limit: int = int(os.getenv("INGEST_REEMBED_LIMIT", "500"))
+    queue_size: int = 200
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    errors: int = 0
+    # суммарное время внутри работы стадии (по всем воркерам), не wall-clock
+    busy_s: float = 0.0
+    # из них ожидание лимита (например per-domain семафора)
+    wait_s: float = 0.0
+
+
+@dataclass
+class IngestSummary:
+    sources: int = 0
+    not_modified: int = 0
+    fetched: int = 0
+    # записи лент, которые уже есть в БД без изменений — не скрейпятся и не пишутся
+    known_unchanged: int = 0
+    enriched: int = 0
+    written: int = 0
+    # после scrape content_hash совпал с сохранённым — запись пропущена
+    unchanged: int = 0
+    # статьи из прошлых прогонов, которым досчитан эмбеддинг
+    reembedded: int = 0
+    batches: int = 0
+    elapsed_s: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=lambda: defaultdict(StageStats))
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "sources": self.sources,
+            "not_modified": self.not_modified,
+            "fetched": self.fetched,
+            "known_unchanged": self.known_unchanged,
+            "enriched": self.enriched,
+            "written": self.written,
+            "unchanged": self.unchanged,
+            "reembedded": self.reembedded,
+            "batches": self.batches,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "items_per_s": round(self.written / self.elapsed_s, 2) if self.elapsed_s else 0.0,
+            "stages": {
+                name: {"items": s.items, "errors": s.errors, "busy_s": round(s.busy_s, 3), "wait_s": round(s.wait_s, 3)}
+                for name, s in self.stages.items()
+            },
+        }
+
+
+class IngestPipeline:
+    """RSS -> scrapper -> БД как три стадии на asyncio-очередях.
+
+    fetch: ленты источников параллельно (fetch_concurrency);
+    scrape: scrape_concurrency воркеров, не больше per_domain_concurrency на домен;
+    write: один писатель (своя AsyncSession), upsert батчами по write_batch_size,
+    после каждого батча — on_batch (эмбеддинги в ai).
+    Статьи, для которых on_batch упал, уже записаны с хешами и следующими прогонами
+    пропускаются, поэтому в конце прогона on_batch повторяется для статей без эмбеддинга.
+    Очереди ограничены, поэтому медленная стадия притормаживает предыдущую, а не копит память.
+    """
+
+    def __init__(
+        self,
+        sources: List[Dict[str, str]],
+        session_factory: Callable[[], AsyncSession],
+        on_batch: Optional[Callable[[AsyncSession, list], Awaitable[None]]] = None,
+        config: Optional[IngestConfig] = None,
+    ) -> None:
+        self.sources = sources
+        self.session_factory = session_factory
+        self.on_batch = on_batch
+        self.config = config or IngestConfig()
+        self.summary = IngestSummary()
+        self._domain_limits: Dict[str, asyncio.Semaphore] = {}
+        # rss_url -> (etag, last_modified) из прошлого прогона и обновлённые в этом
+        self._validators: Dict[str, tuple] = {}
+        self._feed_updates: List[Dict[str, object]] = []
+
+    async def _load_feed_states(self) -> None:
+        async with self.session_factory() as db:
+            states = await get_feed_states(db, [src["rss"] for src in self.sources])
+        self._validators = {url: (st.etag, st.last_modified) for url, st in states.items()}
+
+    async def _known_feed_hashes(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        async with self.session_factory() as db:
+            return await get_article_feed_hashes(db, urls)
+
+    async def _save_feed_states(self) -> None:
+        async with self.session_factory() as db:
+            await save_feed_states(db, self._feed_updates)
+
+    def _domain_sem(self, url: str) -> asyncio.Semaphore:
+        domain = urlsplit(url).netloc.lower()
+        sem = self._domain_limits.get(domain)
+        if sem is None:
+            sem = self._domain_limits[domain] = asyncio.Semaphore(self.config.per_domain_concurrency)
+        return sem
+
+    async def _fetch_worker(self, sources_q: asyncio.Queue, scrape_q: asyncio.Queue) -> None:
+        stats = self.summary.stages["fetch"]
+        while True:
+            src = await sources_q.get()
+            if src is _DONE:
+                return
+            t0 = time.perf_counter()
+            etag, last_modified = self._validators.get(src["rss"], (None, None))
+            try:
+                result = await fetch_rss_items(
+                    src["rss"],
+                    src["name"],
+                    limit=self.config.items_per_source,
+                    etag=etag,
+                    last_modified=last_modified,
+                )
+            except Exception:
+                stats.errors += 1
+                logger.exception("RSS fetch failed", extra={"source": src["name"]})
+                continue
+            finally:
+                stats.busy_s += time.perf_counter() - t0
+            stats.items += 1
+            self._feed_updates.append({
+                "rss_url": src["rss"],
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+                "last_status": result.status,
+            })
+            if result.not_modified:
+                self.summary.not_modified += 1
+                continue
+            self.summary.fetched += len(result.items)
+
+            # все url ленты — одним запросом; дальше идут только новые и изменившиеся записи
+            try:
+                known = await self._known_feed_hashes([it.url for it in result.items])
+            except Exception:
+                logger.exception("Known articles lookup failed", extra={"source": src["name"]})
+                known = {}
+            for it in result.items:
+                if it.url in known and it.feed_hash and known[it.url] == it.feed_hash:
+                    self.summary.known_unchanged += 1
+                    continue
+                await scrape_q.put(it)
+
+    async def _scrape_worker(self, scrape_q: asyncio.Queue, write_q: asyncio.Queue) -> None:
+        stats = self.summary.stages["scrape"]
+        while True:
+            it = await scrape_q.get()
+            if it is _DONE:
+                return
+            t0 = time.perf_counter()
+            async with self._domain_sem(it.url):
+                stats.wait_s += time.perf_counter() - t0
+                enriched = await enrich_with_scrapper(it.url)
+            stats.busy_s += time.perf_counter() - t0
+            stats.items += 1
+            if enriched:
+                self.summary.enriched += 1
+                it.content = enriched
+            else:
+                stats.errors += 1
+                # без feed_hash следующий прогон не сочтёт запись known_unchanged и повторит scrape
+                # (upsert сохраняет прежний хеш через coalesce, а он с новым всё равно не совпадёт)
+                it.feed_hash = None
+            await write_q.put(it)
+
+    async def _write_batch(self, db: AsyncSession, batch: List[FetchedItem]) -> None:
+        write_stats = self.summary.stages["write"]
+        t0 = time.perf_counter()
+        rows = [
+            {
+                "url": it.url,
+                "title": it.title,
+                "content": it.content,
+                "source": it.source,
+                "language": "en",
+                "published_at": it.published_at,
+                "feed_hash": it.feed_hash,
+                "content_hash": fingerprint(it.title, it.content, it.source, it.published_at),
+            }
+            for it in batch
+        ]
+        try:
+            # async-сессия: пока идёт запрос, event loop продолжает fetch/scrape
+            articles = await upsert_articles(db, rows)
+        except Exception:
+            write_stats.errors += 1
+            logger.exception("Article batch write failed", extra={"batch_size": len(batch)})
+            await db.rollback()
+            return
+        finally:
+            write_stats.busy_s += time.perf_counter() - t0
+        write_stats.items += len(articles)
+        self.summary.written += len(articles)
+        self.summary.unchanged += len(rows) - len(articles)
+        self.summary.batches += 1
+
+        if self.on_batch is None or not articles:
+            return
+        embed_stats = self.summary.stages["embed"]
+        t0 = time.perf_counter()
+        try:
+            await self.on_batch(db, articles)
+            embed_stats.items += len(articles)
+        except Exception:
+            embed_stats.errors += 1
+            logger.exception("Embedding articles failed", extra={"batch_size": len(articles)})
+        finally:
+            embed_stats.busy_s += time.perf_counter() - t0
+
+    async def _reembed_missing(self) -> None:
+        if self.on_batch is None or self.config.reembed_limit <= 0:
+            return
+        stats = self.summary.stages["reembed"]
+        t0 = time.perf_counter()
+        async with self.session_factory() as db:
+            try:
+                articles = await list_articles_without_embeddings(db, limit=self.config.reembed_limit)
+                step = max(1, self.config.write_batch_size)
+                for start in range(0, len(articles), step):
+                    batch = articles[start : start + step]
+                    await self.on_batch(db, batch)
+                    stats.items += len(batch)
+                    self.summary.reembedded += len(batch)
+            except Exception:
+                # ai всё ещё недоступен — попробуем в следующем прогоне
+                stats.errors += 1
+                logger.exception("Re-embedding articles without vectors failed")
+            finally:
+                stats.busy_s += time.perf_counter() - t0
+
+    async def _writer(self, write_q: asyncio.Queue) -> None:
+        batch: List[FetchedItem] = []
+        async with self.session_factory() as db:
+            while True:
+                try:
+                    it = await asyncio.wait_for(write_q.get(), timeout=self.config.write_flush_s)
+                except asyncio.TimeoutError:
+                    it = None
+                if it is _DONE:
+                    break
+                if it is not None:
+                    batch.append(it)
+                if batch and (it is None or len(batch) >= self.config.write_batch_size):
+                    await self._write_batch(db, batch)
+                    batch = []
+            if batch:
+                await self._write_batch(db, batch)
+
+    async def run(self) -> IngestSummary:
+        cfg = self.config
+        t0 = time.perf_counter()
+        self.summary.sources = len(self.sources)
+
+        sources_q: asyncio.Queue = asyncio.Queue()
+        scrape_q: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        write_q: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+        for src in self.sources:
+            sources_q.put_nowait(src)
+        try:
+            await self._load_feed_states()
+        except Exception:
+            # без валидаторов просто скачаем ленты целиком
+            logger.exception("Loading feed states failed")
+
+        n_fetch = max(1, min(cfg.fetch_concurrency, len(self.sources)))
+        n_scrape = max(1, cfg.scrape_concurrency)
+        for _ in range(n_fetch):
+            sources_q.put_nowait(_DONE)
+
+        writer = asyncio.create_task(self._writer(write_q))
+        scrapers = [asyncio.create_task(self._scrape_worker(scrape_q, write_q)) for _ in range(n_scrape)]
+        try:
+            await asyncio.gather(*(self._fetch_worker(sources_q, scrape_q) for _ in range(n_fetch)))
+            for _ in scrapers:
+                await scrape_q.put(_DONE)
+            await asyncio.gather(*scrapers)
+            await write_q.put(_DONE)
+            await writer
+        except BaseException:
+            for task in (*scrapers, writer):
+                task.cancel()
+            raise
+
+        await self._reembed_missing()
+
+        try:
+            await self._save_feed_states()
+        except Exception:
+            logger.exception("Saving feed states failed")
+
+        self.summary.elapsed_s = time.perf_counter() - t0
+        logger.info("Ingest run finished", extra={"summary": self.summary.as_dict()})
+        return self.summary
@@ -1,28 +1,34 @@
 from __future__ import annotations
 
+import asyncio
+import base64
 import os
 from typing import Optional, List
 
 from fastapi import FastAPI, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
+import numpy as np
 
 from shared.logging import setup_logging, get_logger
 from gateway.db import get_db
 from gateway.news_sources import DEFAULT_RSS_SOURCES
-from gateway.fetcher import fetch_rss_items, enrich_with_scrapper
+from gateway.ingest import IngestPipeline
+from gateway.http_clients import clients
+from gateway.profiles import record_vote, rebuild_user_profile, profile_vector
 
-from infr.postgres.repositories import (
+from infr.postgres.repositories import encode_article_cursor, decode_article_cursor
+from infr.postgres.repositories.aio import (
     get_or_create_user,
-    upsert_article,
+    get_recommend_context,
     list_latest_articles,
-    list_candidate_articles,
+    list_latest_article_summaries,
     get_articles_by_ids,
+    get_article_summaries_by_ids,
     add_event,
-    get_user_liked_texts,
-    get_user_disliked_texts,
-    get_user_rated_article_ids,
+    save_article_embeddings,
+    get_article_embeddings,
 )
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -30,9 +36,13 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 setup_logging()
 logger = get_logger(__name__)
 
-AI_URL = os.getenv("AI_URL", "http://ai:8002")
-SCRAPPER_URL = os.getenv("SCRAPPER_URL", "http://scrapper:8003")
+# ai не начинает работу, которую мы уже не дождёмся (см. ai.admission)
+AI_DEADLINE_HEADER = "X-Request-Deadline-Ms"
 FETCH_INTERVAL_MIN = int(os.getenv("FETCH_INTERVAL_MIN", "30"))
+# "ann" — кандидаты из ANN-индекса ai по всему корпусу, "recent" — N самых свежих статей
+RECOMMEND_RETRIEVAL = os.getenv("RECOMMEND_RETRIEVAL", "ann")
+# 0 — миграции применяются отдельно (python -m infr.postgres.migrate)
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "1") == "1"
 
 app = FastAPI(title="Gateway API", version="1.0.0")
 
@@ -62,6 +72,8 @@ class ArticleDTO(BaseModel):
 
 class ArticlesResponse(BaseModel):
     items: List[ArticleDTO]
+    # передать как cursor за следующей страницей; None — статей больше нет
+    next_cursor: Optional[str] = None
 
 
 class EventRequest(BaseModel):
@@ -95,24 +107,98 @@ def _article_to_dto(a) -> ArticleDTO:
         id=a.id,
         url=a.url,
         title=a.title,
-        content=a.content,
+        # у ArticleSummary тела нет — оно отдаётся только по запросу
+        content=getattr(a, "content", None),
         source=a.source,
         published_at=a.published_at.isoformat() if a.published_at else None,
     )
 
 
-async def call_ai_recommend(liked: list[str], disliked: list[str], candidates: list[str], top_k: int) -> list[dict]:
+def _article_text(a) -> str:
+    return (a.title or "") + "\n" + (a.content or "")
+
+
+async def embed_and_store_articles(db: AsyncSession, articles: list) -> None:
+    """Считает эмбеддинги статей в ai (он же кладёт их в свой стор) и сохраняет рядом со статьями в БД."""
+    if not articles:
+        return
+    payload = {"items": [{"id": int(a.id), "text": _article_text(a)} for a in articles]}
+    # upsert по id — повтор безопасен
+    r = await clients.ai.post(
+        "/articles/embed",
+        json=payload,
+        headers={AI_DEADLINE_HEADER: "120000"},
+        timeout=120.0,
+        idempotent=True,
+    )
+    r.raise_for_status()
+    data = r.json()
+
+    vectors = {int(it["id"]): base64.b64decode(it["vector"]) for it in data.get("items", [])}
+    await save_article_embeddings(db, model_name=data["model_name"], dim=int(data["dim"]), vectors=vectors)
+
+
+async def _sync_ai_vectors(db: AsyncSession, article_ids: list[int]) -> None:
+    """Догружает в ai векторы, которых у него нет (например после рестарта без стора на диске)."""
+    stored = await get_article_embeddings(db, article_ids)
+
+    by_model: dict[str, list] = {}
+    for e in stored:
+        by_model.setdefault(e.model_name, []).append(e)
+
+    pushed: set[int] = set()
+    for model_name, rows in by_model.items():
+        r = await clients.ai.post("/articles/vectors", json={
+            "model_name": model_name,
+            "items": [
+                {"id": int(e.article_id), "vector": base64.b64encode(e.vector).decode("ascii")}
+                for e in rows
+            ],
+        }, idempotent=True)
+        if r.status_code == 409:
+            # ai сменил модель — эти статьи придётся пересчитать
+            continue
+        r.raise_for_status()
+        pushed.update(int(e.article_id) for e in rows)
+
+    to_embed = [i for i in article_ids if i not in pushed]
+    if to_embed:
+        await embed_and_store_articles(db, await get_articles_by_ids(db, to_embed))
+
+
+async def call_ai_recommend_by_ids(
+    db: AsyncSession,
+    liked_ids: list[int],
+    disliked_ids: list[int],
+    candidate_ids: list[int] | None,
+    top_k: int,
+    exclude_ids: list[int] | None = None,
+    candidate_limit: int = 50,
+    user_vector: np.ndarray | None = None,
+) -> list[dict]:
     payload = {
-        "liked_texts": liked,
-        "disliked_texts": disliked,
-        "candidate_news": candidates,
+        "liked_ids": liked_ids,
+        "disliked_ids": disliked_ids,
+        "candidate_ids": candidate_ids,
+        "exclude_ids": exclude_ids or [],
+        "candidate_limit": candidate_limit,
         "top_k": top_k,
     }
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        r = await client.post(f"{AI_URL}/recommend", json=payload)
+    if user_vector is not None:
+        payload["user_vector"] = base64.b64encode(user_vector.astype("<f4").tobytes()).decode("ascii")
+    for attempt in range(2):
+        # чистое чтение на стороне ai
+        r = await clients.ai.post("/recommend/ids", json=payload, headers={AI_DEADLINE_HEADER: "60000"}, idempotent=True)
         r.raise_for_status()
         data = r.json()
-    return data.get("items", [])
+
+        missing = [int(i) for i in data.get("missing_ids", [])]
+        if not missing or attempt:
+            if missing:
+                logger.warning("AI still misses article vectors", extra={"missing_count": len(missing)})
+            return data.get("items", [])
+        await _sync_ai_vectors(db, missing)
+    return []
 
 
 # ----------------- API -----------------
@@ -122,67 +208,160 @@ def health() -> HealthResponse:
     return HealthResponse(status="ok")
 
 
+@app.get("/stats/http")
+def http_stats() -> dict:
+    """Пулы соединений к upstream'ам: загрузка, латентность, повторы, состояние breaker'а."""
+    return clients.snapshot()
+
+
+@app.get("/stats/ingest")
+def ingest_stats() -> dict:
+    """Сводка последнего прогона ingest: пропускная способность и время по стадиям."""
+    return _last_ingest
+
+
 @app.post("/users/ensure", response_model=EnsureUserResponse)
-def ensure_user(req: EnsureUserRequest, db: Session = Depends(get_db)) -> EnsureUserResponse:
-    u = get_or_create_user(db, req.external_id)
+async def ensure_user(req: EnsureUserRequest, db: AsyncSession = Depends(get_db)) -> EnsureUserResponse:
+    u = await get_or_create_user(db, req.external_id)
     return EnsureUserResponse(user_id=int(u.id))
 
 
 @app.get("/articles/latest", response_model=ArticlesResponse)
-def latest_articles(limit: int = 10, offset: int = 0, db: Session = Depends(get_db)) -> ArticlesResponse:
-    rows = list_latest_articles(db, limit=limit, offset=offset)
-    return ArticlesResponse(items=[_article_to_dto(a) for a in rows])
+async def latest_articles(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    include_content: bool = False,
+    db: AsyncSession = Depends(get_db),
+) -> ArticlesResponse:
+    """Keyset-пагинация: cursor из next_cursor предыдущей страницы. offset — для старых клиентов.
+
+    По умолчанию без content (только колонки списка); тело статьи — GET /articles/{id}
+    или include_content=true.
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_article_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if include_content:
+        rows = await list_latest_articles(db, limit=limit, offset=offset, after=after)
+    else:
+        rows = await list_latest_article_summaries(db, limit=limit, offset=offset, after=after)
+    next_cursor = None
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_article_cursor(last.published_at, last.created_at, int(last.id))
+    return ArticlesResponse(items=[_article_to_dto(a) for a in rows], next_cursor=next_cursor)
+
+
+@app.get("/articles/{article_id}", response_model=ArticleDTO)
+async def get_article(article_id: int, db: AsyncSession = Depends(get_db)) -> ArticleDTO:
+    rows = await get_articles_by_ids(db, [article_id])
+    if not rows:
+        raise HTTPException(status_code=404, detail="Article not found")
+    return _article_to_dto(rows[0])
 
 
 @app.post("/events", response_model=HealthResponse)
-def post_event(req: EventRequest, db: Session = Depends(get_db)) -> HealthResponse:
+async def post_event(req: EventRequest, db: AsyncSession = Depends(get_db)) -> HealthResponse:
     if req.event_type not in ("like", "dislike"):
         raise HTTPException(status_code=400, detail="event_type must be like|dislike")
 
-    u = get_or_create_user(db, req.external_id)
-    _ = add_event(db, user_id=int(u.id), article_id=req.article_id, event_type=req.event_type, event_value=1)
+    u = await get_or_create_user(db, req.external_id)
+    ev = await add_event(db, user_id=int(u.id), article_id=req.article_id, event_type=req.event_type, event_value=1)
+    if ev is None:
+        # тот же голос уже учтён
+        return HealthResponse(status="ok")
+    try:
+        # профильная арифметика синхронная (numpy + несколько запросов) — целиком через run_sync
+        await db.run_sync(record_vote, int(u.id), req.article_id, req.event_type, ev.event_ts)
+    except Exception:
+        # событие уже сохранено; профиль пересчитается из истории при следующем /recommend
+        logger.exception("Failed to update user profile", extra={"user_id": int(u.id)})
+        await db.rollback()
     return HealthResponse(status="ok")
 
 
 @app.post("/recommend", response_model=RecommendResponse)
-async def recommend(req: RecommendRequest, db: Session = Depends(get_db)) -> RecommendResponse:
-    u = get_or_create_user(db, req.external_id)
-
-    liked = get_user_liked_texts(db, int(u.id), limit=30)
-    disliked = get_user_disliked_texts(db, int(u.id), limit=30)
-
-    if len(liked) < 1:
-        raise HTTPException(status_code=400, detail="Need at least 1 liked article to recommend.")
-
-    rated_ids = get_user_rated_article_ids(db, int(u.id))
-
-    candidates_rows = list_candidate_articles(db, limit=req.candidate_limit)
-    # фильтруем те, что уже оценены
-    candidates_rows = [a for a in candidates_rows if a.id not in rated_ids]
+async def recommend(req: RecommendRequest, db: AsyncSession = Depends(get_db)) -> RecommendResponse:
+    # пользователь, профиль, история и кандидаты — одним запросом
+    ctx = await get_recommend_context(db, req.external_id, candidate_limit=req.candidate_limit, history_limit=30)
+    user_id = ctx.user_id
+    if user_id is None:
+        user_id = int((await get_or_create_user(db, req.external_id)).id)
+
+    # один D-мерный вектор вместо истории лайков; нет профиля или устарел — пересчёт из истории
+    profile = ctx.profile
+    if (profile is None or profile.stale) and ctx.rated_ids:
+        profile = await db.run_sync(rebuild_user_profile, user_id)
+    user_vector = profile_vector(profile) if profile is not None else None
+
+    liked_ids: list[int] = []
+    disliked_ids: list[int] = []
+    if user_vector is None:
+        liked_ids = ctx.liked_ids
+        disliked_ids = ctx.disliked_ids
+
+        if len(liked_ids) < 1:
+            raise HTTPException(status_code=400, detail="Need at least 1 liked article to recommend.")
+
+    rated_ids = ctx.rated_ids
+
+    ai_items: list[dict] = []
+    try:
+        if RECOMMEND_RETRIEVAL == "ann":
+            ai_items = await call_ai_recommend_by_ids(
+                db,
+                liked_ids,
+                disliked_ids,
+                None,
+                top_k=req.top_k,
+                exclude_ids=sorted(rated_ids),
+                candidate_limit=req.candidate_limit,
+                user_vector=user_vector,
+            )
 
-    if not candidates_rows:
-        raise HTTPException(status_code=400, detail="No candidates to recommend.")
+        if not ai_items:
+            # индекс ai пуст (или режим "recent") — свежие статьи, уже оценённые отфильтрованы в SQL
+            candidates_rows = ctx.candidates
 
-    candidate_texts = [(a.title or "") + "\n" + (a.content or "") for a in candidates_rows]
+            if not candidates_rows:
+                raise HTTPException(status_code=400, detail="No candidates to recommend.")
 
-    try:
-        ai_items = await call_ai_recommend(liked, disliked, candidate_texts, top_k=req.top_k)
+            ai_items = await call_ai_recommend_by_ids(
+                db,
+                liked_ids,
+                disliked_ids,
+                [int(a.id) for a in candidates_rows],
+                top_k=req.top_k,
+                user_vector=user_vector,
+            )
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 503:
+            # ai сбрасывает нагрузку — отдаём клиенту тот же Retry-After
+            retry_after = e.response.headers.get("Retry-After", "1")
+            raise HTTPException(status_code=503, detail="AI service is overloaded", headers={"Retry-After": retry_after})
+        raise HTTPException(status_code=502, detail=f"AI service error: {e}")
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"AI service error: {e}")
 
-    # ai_items: [{"index": i, "score": s}, ...] индексы относительно candidates_rows
+    # ai_items: [{"article_id": id, "score": s}, ...]
     rec_ids: list[int] = []
     scores_by_article_id: dict[int, float] = {}
 
     for it in ai_items:
-        idx = int(it["index"])
-        score = float(it["score"])
-        if 0 <= idx < len(candidates_rows):
-            art_id = int(candidates_rows[idx].id)
-            rec_ids.append(art_id)
-            scores_by_article_id[art_id] = score
+        art_id = int(it["article_id"])
+        rec_ids.append(art_id)
+        scores_by_article_id[art_id] = float(it["score"])
 
-    articles = get_articles_by_ids(db, rec_ids)
+    # кандидаты из контекста уже загружены; из БД дочитываем только найденные ANN по всему корпусу
+    known = {a.id: a for a in ctx.candidates}
+    missing = [i for i in rec_ids if i not in known]
+    if missing:
+        known.update({int(a.id): a for a in await get_article_summaries_by_ids(db, missing)})
+    articles = [known[i] for i in rec_ids if i in known]
 
     out: list[RecommendedArticleDTO] = []
     for a in articles:
@@ -200,41 +379,24 @@ async def recommend(req: RecommendRequest, db: Session = Depends(get_db)) -> Rec
 
 # ----------------- Scheduler: RSS -> Scrapper -> DB -----------------
 
+_last_ingest: dict = {}
+
+
 async def _job_fetch_news():
     logger.info("Scheduler: fetching news")
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # прогрев scrapper health (не обязательно)
-        try:
-            await client.get(f"{SCRAPPER_URL}/health")
-        except Exception:
-            pass
-
-    from infr.postgres.db import SessionLocal
-    db = SessionLocal()
+    # прогрев scrapper health (не обязательно); заодно открывает keep-alive соединение
     try:
-        for src in DEFAULT_RSS_SOURCES:
-            src_name = src["name"]
-            rss = src["rss"]
-            items = await fetch_rss_items(rss, src_name, limit=20)
-
-            for it in items:
-                # enrich content через scrapper
-                enriched = await enrich_with_scrapper(SCRAPPER_URL, it.url)
-                content = enriched or it.content
-
-                upsert_article(
-                    db,
-                    url=it.url,
-                    title=it.title,
-                    content=content,
-                    source=it.source,
-                    language="en",
-                    published_at=it.published_at,
-                )
-
-        logger.info("Scheduler: done")
-    finally:
-        db.close()
+        await clients.scrapper.get("/health", timeout=30.0)
+    except Exception:
+        pass
+
+    from infr.postgres.db import get_async_sessionmaker
+    # эмбеддинги считаем один раз здесь (на каждый записанный батч), а не на каждый /recommend
+    pipeline = IngestPipeline(DEFAULT_RSS_SOURCES, get_async_sessionmaker(), on_batch=embed_and_store_articles)
+    summary = await pipeline.run()
+    _last_ingest.clear()
+    _last_ingest.update(summary.as_dict())
+    logger.info("Scheduler: done")
 
 
 scheduler = AsyncIOScheduler()
@@ -242,10 +404,12 @@ scheduler = AsyncIOScheduler()
 
 @app.on_event("startup")
 async def on_startup():
-    # создать таблицы (быстро и грязно). лучше потом заменить на alembic.
-    from infr.postgres.db import engine
-    from infr.postgres.db import Base
-    Base.metadata.create_all(bind=engine)
+    clients.start()
+
+    if DB_MIGRATE_ON_STARTUP:
+        # схема — миграциями alembic (infr/postgres/migrations), под advisory lock
+        from infr.postgres.migrate import upgrade
+        await asyncio.to_thread(upgrade)
 
     scheduler.add_job(_job_fetch_news, "interval", minutes=FETCH_INTERVAL_MIN, id="fetch_news", replace_existing=True)
     scheduler.start()
@@ -255,3 +419,12 @@ async def on_startup():
         await _job_fetch_news()
     except Exception:
         logger.exception("Initial fetch failed")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    scheduler.shutdown(wait=False)
+    await clients.aclose()
+
+    from infr.postgres.db import dispose_async_engine
+    await dispose_async_engine()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import math
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from shared.logging import get_logger
+from infr.postgres.models import UserProfile
+from infr.postgres.repositories import (
+    get_article_embeddings,
+    get_user_profile,
+    save_user_profile,
+    mark_user_profile_stale,
+    list_user_events,
+)
+
+logger = get_logger(__name__)
+
+# 0 -> без затухания, иначе вес голоса падает вдвое каждые N дней
+PROFILE_HALF_LIFE_DAYS = float(os.getenv("PROFILE_HALF_LIFE_DAYS", "0"))
+
+
+def _as_utc(ts: datetime | None) -> datetime:
+    if ts is None:
+        return datetime.now(timezone.utc)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _empty_profile(user_id: int, model_name: str, dim: int, ts: datetime) -> UserProfile:
+    zeros = np.zeros(dim, dtype="<f4").tobytes()
+    return UserProfile(
+        user_id=user_id,
+        model_name=model_name,
+        dim=dim,
+        liked_sum=zeros,
+        liked_weight=0.0,
+        liked_count=0,
+        disliked_sum=zeros,
+        disliked_weight=0.0,
+        disliked_count=0,
+        stale=False,
+        updated_at=ts,
+    )
+
+
+def _apply_vote(p: UserProfile, vec: np.ndarray, event_type: str, ts: datetime) -> None:
+    """O(D): затухание накопленных сумм до момента ts и добавление нового голоса."""
+    ts = _as_utc(ts)
+    decay = 1.0
+    if PROFILE_HALF_LIFE_DAYS > 0:
+        dt_days = max((ts - _as_utc(p.updated_at)).total_seconds(), 0.0) / 86400.0
+        decay = math.pow(0.5, dt_days / PROFILE_HALF_LIFE_DAYS)
+
+    liked = np.frombuffer(p.liked_sum, dtype="<f4") * decay
+    disliked = np.frombuffer(p.disliked_sum, dtype="<f4") * decay
+    p.liked_weight = float(p.liked_weight) * decay
+    p.disliked_weight = float(p.disliked_weight) * decay
+
+    if event_type == "like":
+        liked = liked + vec
+        p.liked_weight += 1.0
+        p.liked_count = int(p.liked_count) + 1
+    else:
+        disliked = disliked + vec
+        p.disliked_weight += 1.0
+        p.disliked_count = int(p.disliked_count) + 1
+
+    p.liked_sum = liked.astype("<f4").tobytes()
+    p.disliked_sum = disliked.astype("<f4").tobytes()
+    p.updated_at = max(ts, _as_utc(p.updated_at))
+
+
+def profile_vector(p: UserProfile) -> np.ndarray | None:
+    """mean(liked) - mean(disliked), нормированный. Общий множитель затухания в средних сокращается."""
+    if int(p.liked_count) < 1 or float(p.liked_weight) <= 0:
+        return None
+    vec = np.frombuffer(p.liked_sum, dtype="<f4") / float(p.liked_weight)
+    if float(p.disliked_weight) > 0:
+        vec = vec - np.frombuffer(p.disliked_sum, dtype="<f4") / float(p.disliked_weight)
+    norm = float(np.linalg.norm(vec))
+    if norm > 0:
+        vec = vec / norm
+    return vec.astype(np.float32)
+
+
+def rebuild_user_profile(db: Session, user_id: int) -> UserProfile | None:
+    """Полный пересчёт из истории событий — для новых/устаревших профилей."""
+    events = list_user_events(db, user_id)
+    if not events:
+        return None
+
+    embeddings = {int(e.article_id): e for e in get_article_embeddings(db, list({a for a, _, _ in events}))}
+    if not embeddings:
+        return None
+
+    # профиль строим в пространстве самой частой модели (обычно она одна)
+    models: dict[str, int] = {}
+    for e in embeddings.values():
+        models[e.model_name] = models.get(e.model_name, 0) + 1
+    model_name = max(models, key=models.get)
+    dim = next(int(e.dim) for e in embeddings.values() if e.model_name == model_name)
+
+    p = _empty_profile(user_id, model_name, dim, _as_utc(events[0][2]))
+    skipped = 0
+    for article_id, event_type, ts in events:
+        e = embeddings.get(article_id)
+        if e is None or e.model_name != model_name:
+            skipped += 1
+            continue
+        _apply_vote(p, np.frombuffer(e.vector, dtype="<f4"), event_type, ts)
+
+    # пока у части статей нет векторов, профиль остаётся "stale" и будет пересчитан ещё раз
+    p.stale = skipped > 0
+
+    return save_user_profile(db, p)
+
+
+def record_vote(db: Session, user_id: int, article_id: int, event_type: str, ts: datetime | None) -> None:
+    """Инкрементально обновляет профиль после POST /events."""
+    emb = get_article_embeddings(db, [article_id])
+    p = get_user_profile(db, user_id)
+
+    if not emb:
+        # вектора статьи ещё нет — досчитаем профиль целиком при следующем /recommend
+        if p is not None:
+            mark_user_profile_stale(db, user_id)
+        return
+
+    e = emb[0]
+    if p is None or p.stale or p.model_name != e.model_name:
+        rebuild_user_profile(db, user_id)
+        return
+
+    _apply_vote(p, np.frombuffer(e.vector, dtype="<f4"), event_type, _as_utc(ts))
+    p.stale = False
+    save_user_profile(db, p)
+
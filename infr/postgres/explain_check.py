@@ -0,0 +1,144 @@
+"""Проверка планов: горячие запросы репозиториев должны идти по индексам.
+
+    DATABASE_URL=postgresql+psycopg://... python -m infr.postgres.explain_check
+
+Нужна PostgreSQL с применёнными миграциями (данные не нужны). Каждая функция
+репозитория вызывается как обычно, её SQL перехватывается на уровне курсора и
+прогоняется через EXPLAIN (FORMAT JSON) с enable_seqscan = off: на маленьких таблицах
+планировщик законно выбирает Seq Scan, а проверяется, что подходящий индекс вообще есть.
+Seq Scan по проверяемой таблице (или Sort там, где порядок должен давать индекс) — ошибка,
+код возврата 1.
+"""
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from shared.logging import get_logger, setup_logging
+from infr.postgres.db import engine
+from infr.postgres.repositories import (
+    get_article_feed_hashes,
+    get_recommend_context,
+    get_user_liked_article_ids,
+    get_user_liked_texts,
+    get_user_rated_article_ids,
+    list_articles_without_embeddings,
+    list_candidate_articles,
+    list_latest_articles,
+    list_latest_article_summaries,
+)
+
+logger = get_logger(__name__)
+
+_INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+_SAMPLE_USER_ID = 1
+_SAMPLE_EXTERNAL_ID = "explain-check"
+_SAMPLE_TS = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Check:
+    name: str
+    run: Callable[[Session], Any]
+    tables: Tuple[str, ...]
+    # порядок ORDER BY ... LIMIT должен приходить из индекса, без узла Sort
+    no_sort: bool = False
+
+
+CHECKS: List[Check] = [
+    Check("_join_event_articles", lambda db: get_user_liked_texts(db, _SAMPLE_USER_ID), ("user_events",), no_sort=True),
+    Check("_join_event_article_ids", lambda db: get_user_liked_article_ids(db, _SAMPLE_USER_ID), ("user_events",), no_sort=True),
+    Check("get_user_rated_article_ids", lambda db: get_user_rated_article_ids(db, _SAMPLE_USER_ID), ("user_events",)),
+    Check("list_latest_articles", lambda db: list_latest_articles(db, limit=10), ("articles",), no_sort=True),
+    Check(
+        "list_latest_articles(after=cursor)",
+        lambda db: list_latest_articles(db, limit=10, after=(_SAMPLE_TS, _SAMPLE_TS, 1)),
+        ("articles",),
+        no_sort=True,
+    ),
+    Check("list_latest_article_summaries", lambda db: list_latest_article_summaries(db, limit=10), ("articles",), no_sort=True),
+    Check("list_candidate_articles", lambda db: list_candidate_articles(db, limit=50), ("articles",), no_sort=True),
+    Check(
+        "list_articles_without_embeddings",
+        lambda db: list_articles_without_embeddings(db, limit=50),
+        ("article_embeddings",),
+        no_sort=True,
+    ),
+    Check("get_article_feed_hashes", lambda db: get_article_feed_hashes(db, ["https://example.com/a"]), ("articles",)),
+    Check(
+        "get_recommend_context",
+        lambda db: get_recommend_context(db, _SAMPLE_EXTERNAL_ID),
+        ("users", "user_events", "articles", "user_profiles"),
+    ),
+]
+
+
+def _nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _explain(conn, statement: str, parameters: Any) -> Dict[str, Any]:
+    row = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar_one()
+    return row[0]["Plan"]
+
+
+def run_check(conn, check: Check) -> Tuple[List[str], List[str]]:
+    """(использованные индексы, проблемы) по всем SQL-запросам, которые выполнила функция."""
+    captured: List[Tuple[str, Any]] = []
+
+    def _capture(_conn, _cursor, statement, parameters, _context, _executemany):
+        captured.append((statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", _capture)
+    try:
+        check.run(Session(bind=conn))
+    finally:
+        event.remove(conn, "before_cursor_execute", _capture)
+
+    indexes: List[str] = []
+    problems: List[str] = []
+    for statement, parameters in captured:
+        for node in _nodes(_explain(conn, statement, parameters)):
+            node_type = node.get("Node Type")
+            if node_type in _INDEX_NODES:
+                indexes.append(node["Index Name"])
+            elif node_type == "Seq Scan" and node.get("Relation Name") in check.tables:
+                problems.append(f"Seq Scan on {node['Relation Name']}")
+            elif node_type == "Sort" and check.no_sort:
+                problems.append(f"Sort by {', '.join(node.get('Sort Key', []))}")
+    if not captured:
+        problems.append("no SQL executed")
+    return indexes, problems
+
+
+def main() -> int:
+    setup_logging()
+    failed = 0
+    with engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            print("explain_check needs PostgreSQL", file=sys.stderr)
+            return 2
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for check in CHECKS:
+                indexes, problems = run_check(conn, check)
+                status = "FAIL" if problems else "ok"
+                failed += bool(problems)
+                print(f"{status:4} {check.name}: indexes={sorted(set(indexes))}" + (f" problems={problems}" if problems else ""))
+        finally:
+            trans.rollback()
+    if failed:
+        logger.error("Queries without a usable index", extra={"failed": failed})
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
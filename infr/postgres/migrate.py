@@ -0,0 +1,53 @@
+"""Применение миграций alembic.
+
+    python -m infr.postgres.migrate            # до head
+    python -m infr.postgres.migrate 0002       # до конкретной ревизии
+
+Gateway вызывает upgrade() на старте вместо Base.metadata.create_all.
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from shared.logging import get_logger, setup_logging
+from infr.postgres.db import engine, DATABASE_URL
+
+logger = get_logger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "alembic.ini")
+# ревизия, соответствующая схеме из create_all до появления миграций
+BASELINE_REVISION = "0001"
+# несколько реплик gateway стартуют одновременно — мигрирует одна, остальные ждут
+_ADVISORY_LOCK_ID = 0x616E696D65
+
+
+def alembic_config() -> Config:
+    cfg = Config(ALEMBIC_INI)
+    cfg.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+    return cfg
+
+
+def upgrade(revision: str = "head") -> None:
+    cfg = alembic_config()
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+        cfg.attributes["connection"] = conn
+
+        insp = inspect(conn)
+        if not insp.has_table("alembic_version") and insp.has_table("users"):
+            # база создана create_all: таблицы baseline уже есть, помечаем без выполнения
+            logger.info("Stamping pre-migration schema", extra={"revision": BASELINE_REVISION})
+            command.stamp(cfg, BASELINE_REVISION)
+        command.upgrade(cfg, revision)
+    logger.info("Database schema is up to date", extra={"revision": revision})
+
+
+if __name__ == "__main__":
+    setup_logging()
+    upgrade(sys.argv[1] if len(sys.argv) > 1 else "head")
@@ -0,0 +1,70 @@
+"""baseline: users, articles, user_events
+
+Схема, которую раньше создавал Base.metadata.create_all на старте gateway.
+Базы, созданные так, помечаются этой ревизией без выполнения (см. infr.postgres.migrate).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("external_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id", name="users_pkey"),
+        sa.UniqueConstraint("external_id", name="users_external_id_key"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "articles",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("language", sa.String(length=20), nullable=True),
+        sa.Column("published_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id", name="articles_pkey"),
+        sa.UniqueConstraint("url", name="articles_url_key"),
+    )
+    op.create_index("ix_articles_id", "articles", ["id"])
+
+    op.create_table(
+        "user_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("article_id", sa.BigInteger(), nullable=False),
+        sa.Column("event_type", sa.String(length=32), nullable=False),
+        sa.Column("event_value", sa.SmallInteger(), nullable=True),
+        sa.Column("event_ts", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="user_events_user_id_fkey", ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"], name="user_events_article_id_fkey", ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id", name="user_events_pkey"),
+    )
+    op.create_index("ix_user_events_id", "user_events", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_events")
+    op.drop_table("articles")
+    op.drop_table("users")
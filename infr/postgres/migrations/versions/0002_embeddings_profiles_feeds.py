@@ -0,0 +1,92 @@
+"""article_embeddings, user_profiles, feed_states, articles.feed_hash/content_hash
+
+Эти таблицы и колонки появлялись, пока схема ещё создавалась через create_all. Он
+создаёт только недостающие таблицы, но не добавляет колонки в существующие, поэтому
+в старых базах может быть любое подмножество. Миграция досоздаёт только то, чего нет.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing() -> tuple[set[str], set[str]]:
+    """(таблицы, колонки articles), которые уже есть в базе; в --sql режиме базы нет — пусто."""
+    if op.get_context().as_sql:
+        return set(), set()
+    insp = sa.inspect(op.get_bind())
+    return set(insp.get_table_names()), {c["name"] for c in insp.get_columns("articles")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    tables, article_columns = _existing()
+
+    if "article_embeddings" not in tables:
+        op.create_table(
+            "article_embeddings",
+            sa.Column("article_id", sa.BigInteger(), nullable=False),
+            sa.Column("model_name", sa.String(), nullable=False),
+            sa.Column("dim", sa.Integer(), nullable=False),
+            sa.Column("vector", sa.LargeBinary(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["article_id"], ["articles.id"], name="article_embeddings_article_id_fkey", ondelete="CASCADE"
+            ),
+            sa.PrimaryKeyConstraint("article_id", name="article_embeddings_pkey"),
+        )
+
+    if "user_profiles" not in tables:
+        op.create_table(
+            "user_profiles",
+            sa.Column("user_id", sa.BigInteger(), nullable=False),
+            sa.Column("model_name", sa.String(), nullable=False),
+            sa.Column("dim", sa.Integer(), nullable=False),
+            sa.Column("liked_sum", sa.LargeBinary(), nullable=False),
+            sa.Column("liked_weight", sa.Float(), nullable=False),
+            sa.Column("liked_count", sa.Integer(), nullable=False),
+            sa.Column("disliked_sum", sa.LargeBinary(), nullable=False),
+            sa.Column("disliked_weight", sa.Float(), nullable=False),
+            sa.Column("disliked_count", sa.Integer(), nullable=False),
+            sa.Column("stale", sa.Boolean(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="user_profiles_user_id_fkey", ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("user_id", name="user_profiles_pkey"),
+        )
+
+    if "feed_states" not in tables:
+        op.create_table(
+            "feed_states",
+            sa.Column("rss_url", sa.String(), nullable=False),
+            sa.Column("etag", sa.String(), nullable=True),
+            sa.Column("last_modified", sa.String(), nullable=True),
+            sa.Column("last_status", sa.Integer(), nullable=True),
+            sa.Column("checked_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+            sa.PrimaryKeyConstraint("rss_url", name="feed_states_pkey"),
+        )
+
+    if "feed_hash" not in article_columns:
+        op.add_column("articles", sa.Column("feed_hash", sa.String(length=64), nullable=True))
+    if "content_hash" not in article_columns:
+        op.add_column("articles", sa.Column("content_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("articles", "content_hash")
+    op.drop_column("articles", "feed_hash")
+    op.drop_table("feed_states")
+    op.drop_table("user_profiles")
+    op.drop_table("article_embeddings")
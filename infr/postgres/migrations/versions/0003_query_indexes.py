@@ -0,0 +1,66 @@
+"""индексы под горячие запросы, один голос на (user_id, article_id)
+
+- ix_user_events_user_type_ts (user_id, event_type, event_ts DESC) INCLUDE (article_id):
+  история лайков/дизлайков (_join_event_articles, _join_event_article_ids) — index scan
+  уже в нужном порядке, без сортировки, id статей берутся из индекса;
+- uq_user_events_user_article (user_id, article_id): один голос на статью; его индекс
+  обслуживает get_user_rated_article_ids и NOT EXISTS в get_recommend_context;
+- ix_articles_published_created (published_at DESC, created_at DESC): list_latest_articles
+  и list_candidate_articles читают первые N строк индекса вместо сортировки всей таблицы.
+
+Перед уникальным ограничением дубликаты голосов схлопываются до самого свежего,
+а профили затронутых пользователей помечаются stale (они учитывали дубликаты).
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        WITH dropped AS (
+            DELETE FROM user_events e
+            USING user_events newer
+            WHERE newer.user_id = e.user_id
+              AND newer.article_id = e.article_id
+              AND (newer.event_ts, newer.id) > (e.event_ts, e.id)
+            RETURNING e.user_id
+        )
+        UPDATE user_profiles SET stale = true
+        WHERE user_id IN (SELECT user_id FROM dropped)
+        """
+    )
+    op.create_unique_constraint("uq_user_events_user_article", "user_events", ["user_id", "article_id"])
+    op.create_index(
+        "ix_user_events_user_type_ts",
+        "user_events",
+        ["user_id", "event_type", sa.text("event_ts DESC")],
+        postgresql_include=["article_id"],
+    )
+    op.create_index(
+        "ix_articles_published_created",
+        "articles",
+        [sa.text("published_at DESC"), sa.text("created_at DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_articles_published_created", table_name="articles")
+    op.drop_index("ix_user_events_user_type_ts", table_name="user_events")
+    op.drop_constraint("uq_user_events_user_article", "user_events", type_="unique")
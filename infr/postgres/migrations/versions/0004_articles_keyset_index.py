@@ -0,0 +1,43 @@
+"""индекс для keyset-пагинации /articles/latest
+
+(published_at DESC, created_at DESC, id DESC) совпадает с порядком list_latest_articles
+и с условием после курсора (row comparison по тем же трём колонкам), поэтому страница на
+любой глубине — короткий range scan. Заменяет ix_articles_published_created: его префикс
+обслуживает и list_candidate_articles.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_articles_published_created_id",
+        "articles",
+        [sa.text("published_at DESC"), sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+    op.drop_index("ix_articles_published_created", table_name="articles")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_articles_published_created",
+        "articles",
+        [sa.text("published_at DESC"), sa.text("created_at DESC")],
+    )
+    op.drop_index("ix_articles_published_created_id", table_name="articles")
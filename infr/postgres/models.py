@@ -1,4 +1,4 @@
-from sqlalchemy import Column, SmallInteger, String, BigInteger, DateTime, ForeignKey, Text
+from sqlalchemy import Column, SmallInteger, Integer, String, BigInteger, DateTime, ForeignKey, Text, LargeBinary, Float, Boolean, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from .db import Base
 
@@ -22,6 +22,15 @@ class Article(Base):
     language = Column(String(20))
     published_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # sha256 записи ленты (title/summary/published) — менялась ли она с прошлого ingest
+    feed_hash = Column(String(64), nullable=True)
+    # sha256 сохранённых полей — пропуск записи, если после scrape ничего не изменилось
+    content_hash = Column(String(64), nullable=True)
+
+    # схема меняется только миграциями (infr/postgres/migrations); здесь — для справки и тестов
+    __table_args__ = (
+        Index("ix_articles_published_created_id", published_at.desc(), created_at.desc(), id.desc()),
+    )
 
 
 class UserEvent(Base):
@@ -33,3 +42,46 @@ class UserEvent(Base):
     event_type = Column(String(32), nullable=False)  # "like" | "dislike"
     event_value = Column(SmallInteger)               # 1
     event_ts = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "article_id", name="uq_user_events_user_article"),
+        Index("ix_user_events_user_type_ts", user_id, event_type, event_ts.desc(), postgresql_include=["article_id"]),
+    )
+
+
+class ArticleEmbedding(Base):
+    __tablename__ = "article_embeddings"
+
+    article_id = Column(BigInteger, ForeignKey("articles.id", ondelete="CASCADE"), primary_key=True)
+    model_name = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 little-endian, dim * 4 байт
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+
+class UserProfile(Base):
+    __tablename__ = "user_profiles"
+
+    # running sums эмбеддингов лайков/дизлайков (с опциональным затуханием), float32 bytes
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    model_name = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    liked_sum = Column(LargeBinary, nullable=False)
+    liked_weight = Column(Float, nullable=False, default=0.0)
+    liked_count = Column(Integer, nullable=False, default=0)
+    disliked_sum = Column(LargeBinary, nullable=False)
+    disliked_weight = Column(Float, nullable=False, default=0.0)
+    disliked_count = Column(Integer, nullable=False, default=0)
+    stale = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class FeedState(Base):
+    __tablename__ = "feed_states"
+
+    # валидаторы последнего ответа ленты для условного GET (If-None-Match / If-Modified-Since)
+    rss_url = Column(String, primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    last_status = Column(Integer, nullable=True)
+    checked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
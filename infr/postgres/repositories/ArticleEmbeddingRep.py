@@ -0,0 +1,35 @@
+from __future__ import annotations
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+from infr.postgres.models import Article, ArticleEmbedding
+
+
+def save_article_embeddings(db: Session, *, model_name: str, dim: int, vectors: dict[int, bytes]) -> None:
+    if not vectors:
+        return
+    existing = {
+        e.article_id: e
+        for e in db.query(ArticleEmbedding).filter(ArticleEmbedding.article_id.in_(list(vectors))).all()
+    }
+    for article_id, vec in vectors.items():
+        e = existing.get(article_id)
+        if e:
+            e.model_name = model_name
+            e.dim = dim
+            e.vector = vec
+        else:
+            db.add(ArticleEmbedding(article_id=article_id, model_name=model_name, dim=dim, vector=vec))
+    db.commit()
+
+
+def get_article_embeddings(db: Session, ids: list[int]) -> list[ArticleEmbedding]:
+    if not ids:
+        return []
+    return db.query(ArticleEmbedding).filter(ArticleEmbedding.article_id.in_(ids)).all()
+
+
+def list_articles_without_embeddings(db: Session, limit: int = 500) -> list[Article]:
+    """Статьи без сохранённого эмбеддинга (например, ai был недоступен на ingest), свежие первыми."""
+    has_embedding = exists().where(ArticleEmbedding.article_id == Article.id)
+    q = select(Article).where(~has_embedding).order_by(Article.id.desc()).limit(limit)
+    return list(db.scalars(q))
@@ -1,10 +1,103 @@
 from __future__ import annotations
-from datetime import datetime
+import base64
+import binascii
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from infr.postgres.models import Article
 
 
+# ~10 параметров на строку: 1000 строк держат запрос далеко от лимита в 65535 параметров
+UPSERT_CHUNK_SIZE = 1000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# published_at IS NULL в курсоре
+_NULL_TS = -(2 ** 63)
+
+_ARTICLE_FIELDS = ("url", "title", "content", "source", "language", "published_at", "feed_hash", "content_hash")
+
+
+def _insert(db: Session):
+    # on_conflict_do_update есть у postgresql и sqlite; основной диалект — postgresql
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(Article)
+    return pg_insert(Article)
+
+
+def _upsert_statement(db: Session, rows: list[dict]):
+    stmt = _insert(db).values(rows)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[Article.url],
+        set_={
+            "title": excluded.title,
+            "content": excluded.content,
+            "source": excluded.source,
+            "language": excluded.language,
+            "published_at": func.coalesce(excluded.published_at, Article.published_at),
+            "feed_hash": func.coalesce(excluded.feed_hash, Article.feed_hash),
+            "content_hash": excluded.content_hash,
+        },
+        # без хеша — всегда перезаписываем; с хешем — только если что-то изменилось
+        where=or_(
+            excluded.content_hash.is_(None),
+            Article.content_hash.is_distinct_from(excluded.content_hash),
+            Article.feed_hash.is_distinct_from(excluded.feed_hash),
+        ),
+    )
+
+
+def _normalize(items: list[dict]) -> list[dict]:
+    # multi-row VALUES требует одинаковых ключей; дубликаты url внутри одного
+    # INSERT ... ON CONFLICT недопустимы — побеждает последний
+    by_url = {it["url"]: {f: it.get(f) for f in _ARTICLE_FIELDS} for it in items}
+    return list(by_url.values())
+
+
+def _execute_upsert(db: Session, rows: list[dict], chunk_size: int, returning: tuple, **options) -> list:
+    """Единственный путь записи статей: INSERT ... ON CONFLICT (url) DO UPDATE чанками
+    по chunk_size, одна транзакция на чанк. Возвращает RETURNING вставленных/изменённых строк."""
+    out: list = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        out.extend(db.execute(_upsert_statement(db, chunk).returning(*returning), execution_options=options).all())
+        db.commit()
+    return out
+
+
+def bulk_upsert_articles(db: Session, items: list[dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> list[int]:
+    """Upsert без ORM-объектов — для бэкфиллов на десятки тысяч статей.
+
+    Возвращает id для каждого элемента items в том же порядке: и вставленных/изменённых,
+    и пропущенных из-за совпавших хешей (их id — отдельным SELECT по url).
+    """
+    rows = _normalize(items)
+    ids_by_url = {url: int(i) for i, url in _execute_upsert(db, rows, chunk_size, (Article.id, Article.url))}
+    unchanged = [r["url"] for r in rows if r["url"] not in ids_by_url]
+    for start in range(0, len(unchanged), chunk_size):
+        chunk = unchanged[start : start + chunk_size]
+        ids_by_url.update((url, int(i)) for i, url in db.execute(select(Article.id, Article.url).where(Article.url.in_(chunk))))
+    return [ids_by_url[it["url"]] for it in items]
+
+
+def upsert_articles(db: Session, items: list[dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> list[Article]:
+    """То же, что bulk_upsert_articles, но возвращает ORM-объекты только вставленных/изменённых статей
+    (ingest отдаёт их в эмбеддинг).
+
+    items — словари с ключами url, title, content, source, language, published_at и
+    необязательными feed_hash, content_hash. Статьи с совпавшим content_hash не переписываются
+    и в результат не попадают.
+    """
+    rows = _normalize(items)
+    out = [row[0] for row in _execute_upsert(db, rows, chunk_size, (Article,), populate_existing=True)]
+    order = {r["url"]: i for i, r in enumerate(rows)}
+    return sorted(out, key=lambda a: order[a.url])
+
+
 def upsert_article(
     db: Session,
     *,
@@ -15,39 +108,116 @@ def upsert_article(
     language: str | None = None,
     published_at: datetime | None = None,
 ) -> Article:
-    a = db.query(Article).filter(Article.url == url).one_or_none()
-    if a:
-        a.title = title
-        a.content = content
-        a.source = source
-        a.language = language
-        a.published_at = published_at or a.published_at
-        db.commit()
-        db.refresh(a)
-        return a
-
-    a = Article(
-        url=url,
-        title=title,
-        content=content,
-        source=source,
-        language=language,
-        published_at=published_at,
-    )
-    db.add(a)
-    db.commit()
-    db.refresh(a)
-    return a
+    return upsert_articles(db, [{
+        "url": url,
+        "title": title,
+        "content": content,
+        "source": source,
+        "language": language,
+        "published_at": published_at,
+    }])[0]
 
 
-def list_latest_articles(db: Session, limit: int = 10, offset: int = 0) -> list[Article]:
-    return (
-        db.query(Article)
-        .order_by(desc(Article.published_at), desc(Article.created_at))
-        .offset(offset)
-        .limit(limit)
-        .all()
+def get_article_feed_hashes(db: Session, urls: list[str]) -> dict[str, str | None]:
+    """url -> feed_hash для уже известных статей, одним запросом."""
+    if not urls:
+        return {}
+    rows = db.query(Article.url, Article.feed_hash).filter(Article.url.in_(urls)).all()
+    return {url: feed_hash for url, feed_hash in rows}
+
+
+def encode_article_cursor(published_at: datetime | None, created_at: datetime, article_id: int) -> str:
+    """Непрозрачный курсор позиции в ленте: 24 байта (3 x int64 микросекунд/id) в base64url.
+
+    Компактный, чтобы помещаться в callback_data телеграм-кнопки (лимит 64 байта).
+    """
+    raw = struct.pack(
+        ">qqq",
+        _NULL_TS if published_at is None else _to_micros(published_at),
+        _to_micros(created_at),
+        int(article_id),
     )
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_article_cursor(cursor: str) -> tuple[datetime | None, datetime, int]:
+    """(published_at, created_at, id); ValueError — курсор повреждён."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        published, created, article_id = struct.unpack(">qqq", raw)
+    except (binascii.Error, struct.error) as e:
+        raise ValueError("invalid cursor") from e
+    return (None if published == _NULL_TS else _from_micros(published)), _from_micros(created), article_id
+
+
+def _to_micros(ts: datetime) -> int:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(us: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def _latest_order():
+    # NULLS FIRST явно: так сортирует PostgreSQL по DESC, и так устроен индекс
+    return (Article.published_at.desc().nulls_first(), Article.created_at.desc(), Article.id.desc())
+
+
+def _after(cursor: tuple[datetime | None, datetime, int]):
+    """Строки строго после курсора в порядке _latest_order — условие, которое индекс отдаёт диапазоном."""
+    published_at, created_at, article_id = cursor
+    rest = tuple_(Article.created_at, Article.id) < tuple_(created_at, article_id)
+    if published_at is None:
+        # внутри группы без даты публикации, за ней — все датированные статьи
+        return or_(and_(Article.published_at.is_(None), rest), Article.published_at.is_not(None))
+    return tuple_(Article.published_at, Article.created_at, Article.id) < tuple_(published_at, created_at, article_id)
+
+
+@dataclass(slots=True)
+class ArticleSummary:
+    """Статья без тела — для списков: без identity map и без колонки content.
+    Тело — по требованию через get_article_contents."""
+    id: int
+    url: str
+    title: str
+    source: str
+    published_at: datetime | None
+    created_at: datetime
+
+
+_SUMMARY_COLUMNS = (Article.id, Article.url, Article.title, Article.source, Article.published_at, Article.created_at)
+
+
+def _latest_select(columns, limit: int, offset: int, after):
+    q = select(*columns)
+    if after is not None:
+        q = q.where(_after(after))
+    elif offset:
+        q = q.offset(offset)
+    return q.order_by(*_latest_order()).limit(limit)
+
+
+def list_latest_articles(
+    db: Session,
+    limit: int = 10,
+    offset: int = 0,
+    after: tuple[datetime | None, datetime, int] | None = None,
+) -> list[Article]:
+    """Свежие статьи. after — позиция из decode_article_cursor: страница за O(limit) на любой глубине
+    и без сдвигов, когда ingest добавляет статьи; offset оставлен для старых клиентов."""
+    return list(db.scalars(_latest_select((Article,), limit, offset, after)))
+
+
+def list_latest_article_summaries(
+    db: Session,
+    limit: int = 10,
+    offset: int = 0,
+    after: tuple[datetime | None, datetime, int] | None = None,
+) -> list[ArticleSummary]:
+    """То же, что list_latest_articles, но только колонки _SUMMARY_COLUMNS."""
+    return [ArticleSummary(*row) for row in db.execute(_latest_select(_SUMMARY_COLUMNS, limit, offset, after))]
 
 
 def list_candidate_articles(db: Session, limit: int = 50) -> list[Article]:
@@ -59,9 +229,29 @@ def list_candidate_articles(db: Session, limit: int = 50) -> list[Article]:
     )
 
 
+def list_candidate_article_summaries(db: Session, limit: int = 50) -> list[ArticleSummary]:
+    q = select(*_SUMMARY_COLUMNS).order_by(desc(Article.published_at), desc(Article.created_at)).limit(limit)
+    return [ArticleSummary(*row) for row in db.execute(q)]
+
+
 def get_articles_by_ids(db: Session, ids: list[int]) -> list[Article]:
     if not ids:
         return []
     rows = db.query(Article).filter(Article.id.in_(ids)).all()
     by_id = {a.id: a for a in rows}
     return [by_id[i] for i in ids if i in by_id]
+
+
+def get_article_summaries_by_ids(db: Session, ids: list[int]) -> list[ArticleSummary]:
+    """Порядок как в ids, отсутствующие пропускаются."""
+    if not ids:
+        return []
+    by_id = {row.id: ArticleSummary(*row) for row in db.execute(select(*_SUMMARY_COLUMNS).where(Article.id.in_(ids)))}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def get_article_contents(db: Session, ids: list[int]) -> dict[int, str | None]:
+    """Тела статей по требованию: id -> content."""
+    if not ids:
+        return {}
+    return {int(i): c for i, c in db.execute(select(Article.id, Article.content).where(Article.id.in_(ids)))}
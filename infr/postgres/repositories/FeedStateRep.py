@@ -0,0 +1,19 @@
+from __future__ import annotations
+from sqlalchemy.orm import Session
+from infr.postgres.models import FeedState
+
+
+def get_feed_states(db: Session, rss_urls: list[str]) -> dict[str, FeedState]:
+    if not rss_urls:
+        return {}
+    rows = db.query(FeedState).filter(FeedState.rss_url.in_(rss_urls)).all()
+    return {s.rss_url: s for s in rows}
+
+
+def save_feed_states(db: Session, states: list[dict]) -> None:
+    """states — словари rss_url, etag, last_modified, last_status; один commit на все ленты."""
+    if not states:
+        return
+    for st in states:
+        db.merge(FeedState(**st))
+    db.commit()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy.orm import Session
+from sqlalchemy import (
+    BigInteger, Boolean, DateTime, Float, Integer, LargeBinary, String,
+    cast, desc, exists, func, literal, null, select, union_all,
+)
+from infr.postgres.models import Article, User, UserEvent, UserProfile
+
+
+@dataclass(slots=True)
+class CandidateRow:
+    id: int
+    title: str
+    url: str
+    source: str
+    published_at: Any = None
+
+
+@dataclass
+class RecommendContext:
+    # None — пользователя с таким external_id ещё нет
+    user_id: int | None = None
+    profile: UserProfile | None = None
+    # последние history_limit по каждому типу, свежие первыми
+    liked_ids: list[int] = field(default_factory=list)
+    disliked_ids: list[int] = field(default_factory=list)
+    # все статьи, по которым у пользователя есть событие
+    rated_ids: set[int] = field(default_factory=set)
+    # свежие статьи без событий пользователя (отфильтрованы в SQL до LIMIT)
+    candidates: list[CandidateRow] = field(default_factory=list)
+
+
+# общий набор колонок для UNION ALL; недостающие в ветке колонки — типизированный NULL
+_COLUMNS = {
+    "id": BigInteger,
+    "event_type": String,
+    "rn": BigInteger,
+    "title": String,
+    "url": String,
+    "source": String,
+    "published_at": DateTime(timezone=True),
+    "model_name": String,
+    "dim": Integer,
+    "liked_sum": LargeBinary,
+    "liked_weight": Float,
+    "liked_count": Integer,
+    "disliked_sum": LargeBinary,
+    "disliked_weight": Float,
+    "disliked_count": Integer,
+    "stale": Boolean,
+    "updated_at": DateTime(timezone=True),
+}
+
+_PROFILE_FIELDS = (
+    "model_name", "dim", "liked_sum", "liked_weight", "liked_count",
+    "disliked_sum", "disliked_weight", "disliked_count", "stale", "updated_at",
+)
+
+
+def _branch(kind: str, **exprs):
+    cols = [literal(kind, String).label("kind")]
+    for name, type_ in _COLUMNS.items():
+        expr = exprs[name] if name in exprs else cast(null(), type_)
+        cols.append(expr.label(name))
+    return select(*cols)
+
+
+def get_recommend_context(
+    db: Session,
+    external_id: str,
+    candidate_limit: int = 50,
+    history_limit: int = 30,
+) -> RecommendContext:
+    """Всё, что нужно /recommend, за один запрос: пользователь с профилем, история событий и кандидаты.
+
+    Ветки UNION ALL различаются колонкой kind: "user" (строка пользователя + профиль),
+    "event" (каждое событие с номером по свежести внутри своего типа), "candidate".
+    """
+    user_id = select(User.id).where(User.external_id == external_id).scalar_subquery()
+
+    user_q = (
+        _branch("user", id=User.id, **{f: getattr(UserProfile, f) for f in _PROFILE_FIELDS})
+        .select_from(User)
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .where(User.external_id == external_id)
+    )
+
+    event_rn = func.row_number().over(partition_by=UserEvent.event_type, order_by=desc(UserEvent.event_ts))
+    events_q = _branch(
+        "event",
+        id=UserEvent.article_id,
+        event_type=UserEvent.event_type,
+        rn=event_rn,
+    ).where(UserEvent.user_id == user_id)
+
+    rated = exists().where(UserEvent.user_id == user_id, UserEvent.article_id == Article.id)
+    cand = (
+        select(
+            Article.id,
+            Article.title,
+            Article.url,
+            Article.source,
+            Article.published_at,
+            func.row_number().over(order_by=(desc(Article.published_at), desc(Article.created_at))).label("rn"),
+        )
+        .where(~rated)
+        .order_by(desc(Article.published_at), desc(Article.created_at))
+        .limit(candidate_limit)
+        .subquery()
+    )
+    cand_q = _branch(
+        "candidate",
+        id=cand.c.id,
+        rn=cand.c.rn,
+        title=cand.c.title,
+        url=cand.c.url,
+        source=cand.c.source,
+        published_at=cand.c.published_at,
+    )
+
+    ctx = RecommendContext()
+    events: list[tuple[int, int, str]] = []
+    candidates: list[tuple[int, CandidateRow]] = []
+    for r in db.execute(union_all(user_q, events_q, cand_q)).mappings():
+        if r["kind"] == "user":
+            ctx.user_id = int(r["id"])
+            if r["model_name"] is not None:
+                ctx.profile = UserProfile(user_id=ctx.user_id, **{f: r[f] for f in _PROFILE_FIELDS})
+        elif r["kind"] == "event":
+            events.append((int(r["rn"]), int(r["id"]), str(r["event_type"])))
+        else:
+            candidates.append((
+                int(r["rn"]),
+                CandidateRow(id=int(r["id"]), title=r["title"], url=r["url"], source=r["source"], published_at=r["published_at"]),
+            ))
+
+    events.sort()
+    for rn, article_id, event_type in events:
+        ctx.rated_ids.add(article_id)
+        if rn > history_limit:
+            continue
+        if event_type == "like":
+            ctx.liked_ids.append(article_id)
+        elif event_type == "dislike":
+            ctx.disliked_ids.append(article_id)
+    ctx.candidates = [row for _, row in sorted(candidates, key=lambda c: c[0])]
+    return ctx
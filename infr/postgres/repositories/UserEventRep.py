@@ -1,18 +1,40 @@
 from __future__ import annotations
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from infr.postgres.models import UserEvent, Article
+from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
+from infr.postgres.models import UserEvent, Article, UserProfile
 
 
-def add_event(db: Session, *, user_id: int, article_id: int, event_type: str, event_value: int = 1) -> UserEvent:
-    ev = UserEvent(
-        user_id=user_id,
-        article_id=article_id,
-        event_type=event_type,
-        event_value=event_value,
+def add_event(db: Session, *, user_id: int, article_id: int, event_type: str, event_value: int = 1) -> UserEvent | None:
+    """Один голос на (user_id, article_id): повтор того же голоса ничего не меняет и возвращает None,
+    смена like <-> dislike перезаписывает событие и помечает профиль пользователя устаревшим."""
+    ev = (
+        db.query(UserEvent)
+        .filter(UserEvent.user_id == user_id, UserEvent.article_id == article_id)
+        .one_or_none()
     )
-    db.add(ev)
-    db.commit()
+    if ev is not None and ev.event_type == event_type:
+        return None
+    if ev is None:
+        ev = UserEvent(
+            user_id=user_id,
+            article_id=article_id,
+            event_type=event_type,
+            event_value=event_value,
+        )
+        db.add(ev)
+    else:
+        ev.event_type = event_type
+        ev.event_value = event_value
+        ev.event_ts = func.now()
+        # профиль уже учёл прежний голос — пересчитается из истории
+        db.query(UserProfile).filter(UserProfile.user_id == user_id).update({UserProfile.stale: True})
+    try:
+        db.commit()
+    except IntegrityError:
+        # параллельный запрос успел записать этот же голос
+        db.rollback()
+        return None
     db.refresh(ev)
     return ev
 
@@ -22,6 +44,16 @@ def get_user_rated_article_ids(db: Session, user_id: int) -> set[int]:
     return {r[0] for r in rows}
 
 
+def _join_event_article_ids(db: Session, user_id: int, event_type: str, limit: int = 30) -> list[int]:
+    q = (
+        db.query(UserEvent.article_id)
+        .filter(UserEvent.user_id == user_id, UserEvent.event_type == event_type)
+        .order_by(desc(UserEvent.event_ts))
+        .limit(limit)
+    )
+    return [int(r[0]) for r in q.all()]
+
+
 def _join_event_articles(db: Session, user_id: int, event_type: str, limit: int = 30) -> list[str]:
     q = (
         db.query(Article.title, Article.content)
@@ -44,3 +76,11 @@ def get_user_liked_texts(db: Session, user_id: int, limit: int = 30) -> list[str
 
 def get_user_disliked_texts(db: Session, user_id: int, limit: int = 30) -> list[str]:
     return _join_event_articles(db, user_id, "dislike", limit)
+
+
+def get_user_liked_article_ids(db: Session, user_id: int, limit: int = 30) -> list[int]:
+    return _join_event_article_ids(db, user_id, "like", limit)
+
+
+def get_user_disliked_article_ids(db: Session, user_id: int, limit: int = 30) -> list[int]:
+    return _join_event_article_ids(db, user_id, "dislike", limit)
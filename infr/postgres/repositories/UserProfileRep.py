@@ -0,0 +1,28 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy.orm import Session
+from infr.postgres.models import UserProfile, UserEvent
+
+
+def get_user_profile(db: Session, user_id: int) -> UserProfile | None:
+    return db.get(UserProfile, user_id)
+
+
+def save_user_profile(db: Session, profile: UserProfile) -> UserProfile:
+    profile = db.merge(profile)
+    db.commit()
+    return profile
+
+
+def mark_user_profile_stale(db: Session, user_id: int) -> None:
+    db.query(UserProfile).filter(UserProfile.user_id == user_id).update({UserProfile.stale: True})
+    db.commit()
+
+
+def list_user_events(db: Session, user_id: int) -> list[tuple[int, str, datetime]]:
+    q = (
+        db.query(UserEvent.article_id, UserEvent.event_type, UserEvent.event_ts)
+        .filter(UserEvent.user_id == user_id)
+        .order_by(UserEvent.event_ts)
+    )
+    return [(int(a), str(t), ts) for a, t, ts in q.all()]
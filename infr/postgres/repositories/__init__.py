@@ -1,26 +1,82 @@
 from .UsersRep import get_or_create_user
 from .ArticlesRep import (
     upsert_article,
+    upsert_articles,
+    bulk_upsert_articles,
+    get_article_feed_hashes,
+    encode_article_cursor,
+    decode_article_cursor,
     list_latest_articles,
     list_candidate_articles,
     get_articles_by_ids,
+    ArticleSummary,
+    list_latest_article_summaries,
+    list_candidate_article_summaries,
+    get_article_summaries_by_ids,
+    get_article_contents,
 )
 from .UserEventRep import (
     add_event,
     get_user_liked_texts,
     get_user_disliked_texts,
     get_user_rated_article_ids,
+    get_user_liked_article_ids,
+    get_user_disliked_article_ids,
+)
+from .ArticleEmbeddingRep import (
+    save_article_embeddings,
+    get_article_embeddings,
+    list_articles_without_embeddings,
+)
+from .FeedStateRep import (
+    get_feed_states,
+    save_feed_states,
+)
+from .RecommendContextRep import (
+    RecommendContext,
+    CandidateRow,
+    get_recommend_context,
+)
+from .UserProfileRep import (
+    get_user_profile,
+    save_user_profile,
+    mark_user_profile_stale,
+    list_user_events,
 )
 
 __all__ = [
     "get_or_create_user",
     "upsert_article",
+    "upsert_articles",
+    "bulk_upsert_articles",
+    "get_article_feed_hashes",
+    "encode_article_cursor",
+    "decode_article_cursor",
     "list_latest_articles",
     "list_candidate_articles",
     "get_articles_by_ids",
+    "ArticleSummary",
+    "list_latest_article_summaries",
+    "list_candidate_article_summaries",
+    "get_article_summaries_by_ids",
+    "get_article_contents",
     "add_event",
     "get_user_liked_texts",
     "get_user_disliked_texts",
     "get_user_rated_article_ids",
+    "get_user_liked_article_ids",
+    "get_user_disliked_article_ids",
+    "save_article_embeddings",
+    "get_article_embeddings",
+    "list_articles_without_embeddings",
+    "get_feed_states",
+    "save_feed_states",
+    "RecommendContext",
+    "CandidateRow",
+    "get_recommend_context",
+    "get_user_profile",
+    "save_user_profile",
+    "mark_user_profile_stale",
+    "list_user_events",
 ]
 
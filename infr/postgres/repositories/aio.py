@@ -0,0 +1,94 @@
+"""Async-версии репозиториев для AsyncSession.
+
+Запросы те же, что в синхронных модулях: каждая функция выполняется через
+AsyncSession.run_sync, то есть ввод-вывод идёт через async-драйвер и event loop
+не блокируется, а логика запросов не дублируется.
+
+    from infr.postgres.repositories import aio as repo
+    user = await repo.get_or_create_user(db, external_id)
+"""
+from __future__ import annotations
+
+import functools
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import UsersRep, ArticlesRep, UserEventRep, ArticleEmbeddingRep, FeedStateRep, UserProfileRep, RecommendContextRep
+
+T = TypeVar("T")
+
+
+def _async(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args: Any, **kwargs: Any) -> T:
+        return await db.run_sync(fn, *args, **kwargs)
+
+    return wrapper
+
+
+get_or_create_user = _async(UsersRep.get_or_create_user)
+
+upsert_article = _async(ArticlesRep.upsert_article)
+upsert_articles = _async(ArticlesRep.upsert_articles)
+bulk_upsert_articles = _async(ArticlesRep.bulk_upsert_articles)
+get_article_feed_hashes = _async(ArticlesRep.get_article_feed_hashes)
+list_latest_articles = _async(ArticlesRep.list_latest_articles)
+list_candidate_articles = _async(ArticlesRep.list_candidate_articles)
+get_articles_by_ids = _async(ArticlesRep.get_articles_by_ids)
+list_latest_article_summaries = _async(ArticlesRep.list_latest_article_summaries)
+list_candidate_article_summaries = _async(ArticlesRep.list_candidate_article_summaries)
+get_article_summaries_by_ids = _async(ArticlesRep.get_article_summaries_by_ids)
+get_article_contents = _async(ArticlesRep.get_article_contents)
+
+add_event = _async(UserEventRep.add_event)
+get_user_liked_texts = _async(UserEventRep.get_user_liked_texts)
+get_user_disliked_texts = _async(UserEventRep.get_user_disliked_texts)
+get_user_rated_article_ids = _async(UserEventRep.get_user_rated_article_ids)
+get_user_liked_article_ids = _async(UserEventRep.get_user_liked_article_ids)
+get_user_disliked_article_ids = _async(UserEventRep.get_user_disliked_article_ids)
+
+save_article_embeddings = _async(ArticleEmbeddingRep.save_article_embeddings)
+get_article_embeddings = _async(ArticleEmbeddingRep.get_article_embeddings)
+list_articles_without_embeddings = _async(ArticleEmbeddingRep.list_articles_without_embeddings)
+
+get_feed_states = _async(FeedStateRep.get_feed_states)
+save_feed_states = _async(FeedStateRep.save_feed_states)
+
+get_recommend_context = _async(RecommendContextRep.get_recommend_context)
+
+get_user_profile = _async(UserProfileRep.get_user_profile)
+save_user_profile = _async(UserProfileRep.save_user_profile)
+mark_user_profile_stale = _async(UserProfileRep.mark_user_profile_stale)
+list_user_events = _async(UserProfileRep.list_user_events)
+
+__all__ = [
+    "get_or_create_user",
+    "upsert_article",
+    "upsert_articles",
+    "bulk_upsert_articles",
+    "get_article_feed_hashes",
+    "list_latest_articles",
+    "list_candidate_articles",
+    "get_articles_by_ids",
+    "list_latest_article_summaries",
+    "list_candidate_article_summaries",
+    "get_article_summaries_by_ids",
+    "get_article_contents",
+    "add_event",
+    "get_user_liked_texts",
+    "get_user_disliked_texts",
+    "get_user_rated_article_ids",
+    "get_user_liked_article_ids",
+    "get_user_disliked_article_ids",
+    "save_article_embeddings",
+    "get_article_embeddings",
+    "list_articles_without_embeddings",
+    "get_feed_states",
+    "save_feed_states",
+    "get_recommend_context",
+    "get_user_profile",
+    "save_user_profile",
+    "mark_user_profile_stale",
+    "list_user_events",
+]
@@ -1,12 +1,29 @@
 import logging
 from logging.config import dictConfig
 
+# атрибуты, которые есть у любого LogRecord; всё остальное пришло через extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class ExtraFormatter(logging.Formatter):
+    """Стандартный формат + поля из extra= в виде " | key=value key2=value2"."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        # formatMessage, а не format: поля встают в ту же строку, до traceback
+        line = super().formatMessage(record)
+        extra = {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        if not extra:
+            return line
+        return line + " | " + " ".join(f"{k}={v}" for k, v in extra.items())
+
+
 LOGGING_CONFIG = {
     "version" : 1,
     "disable_existing_loggers" : False,
 
     "formatters" : {
         "default" : {
+            "()" : ExtraFormatter,
             "format" : "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
         },
     },